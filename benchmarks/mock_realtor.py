@@ -0,0 +1,144 @@
+"""Local stand-in for the realty-in-us `/properties/v3/list` endpoint.
+
+Serves deterministic synthetic listings newest first, with `limit`/`offset`
+pagination and `total`, configurable latency, and optional injected
+500s / 429s, so fetch throughput and retry behaviour can be measured
+offline.
+
+    python benchmarks/mock_realtor.py --port 8001 --latency 0.1 --listings 450
+
+or in-process:
+
+    with MockRealtorServer(latency=0.05) as mock:
+        RealtorClient("test-key", url=mock.url).fetch_listings(["85004"])
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from synthetic import make_realtor_home
+
+
+class MockRealtorServer:
+    def __init__(self, listings_per_zip=500, latency=0.05, error_rate=0.0, throttle_rate=0.0,
+                 max_limit=200, host="127.0.0.1", port=0, seed=0):
+        self.listings_per_zip = listings_per_zip
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.max_limit = max_limit
+        self.seed = seed
+        self.totals = {}
+        self.requests = []
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/properties/v3/list"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def total(self, zip_code):
+        return self.totals.get(zip_code, self.listings_per_zip)
+
+    def add_listings(self, zip_code, n):
+        """Publishes `n` new listings for `zip_code`; they come first in the next responses."""
+        with self._lock:
+            self.totals[zip_code] = self.total(zip_code) + n
+
+    def page(self, zip_code, offset, limit):
+        total = self.total(zip_code)
+        # Newest first: offset 0 is the highest listing number
+        ks = range(total - 1 - offset, max(total - offset - limit, 0) - 1, -1)
+        return total, [make_realtor_home(zip_code, k, self.seed) for k in ks]
+
+    def _outcome(self):
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.error_rate:
+            return 500
+        if roll < self.error_rate + self.throttle_rate:
+            return 429
+        return 200
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                zip_code = str(body.get("postal_code", ""))
+                offset = int(body.get("offset", 0))
+                limit = min(int(body.get("limit", 50)), mock.max_limit)
+                with mock._lock:
+                    mock.requests.append((time.time(), zip_code, offset))
+                if mock.latency:
+                    time.sleep(mock.latency)
+
+                if not self.headers.get("X-RapidAPI-Key"):
+                    self._send(401, {"message": "Missing API key"})
+                    return
+                status = mock._outcome()
+                if status != 200:
+                    self._send(status, {"message": "Too many requests" if status == 429 else "Error"})
+                    return
+                total, results = mock.page(zip_code, offset, limit)
+                self._send(200, {"data": {"home_search": {
+                    "count": len(results), "total": total, "results": results
+                }}})
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a mock realty-in-us listing server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per request")
+    parser.add_argument("--listings", type=int, default=500, help="listings per ZIP")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    mock = MockRealtorServer(args.listings, args.latency, args.error_rate, args.throttle_rate,
+                             host=args.host, port=args.port)
+    print(f"Mock listings on {mock.url}")
+    mock._server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""Benchmark suite for the pricing and risk-model pipeline.
+
+Runs each benchmark over synthetic data at several sizes and writes the
+timings as JSON, so two commits can be compared:
+
+    python benchmarks/run.py --out benchmarks/results/$(git rev-parse --short HEAD).json
+    python benchmarks/run.py --sizes 1000 100000 --only match capi
+    python benchmarks/run.py --compare old.json new.json
+
+Benchmarks whose dependencies are missing (e.g. torch) are skipped.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [os.path.join(ROOT, "streamlit"), os.path.join(ROOT, "risk_score_models")]
+
+import synthetic  # noqa: E402
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+
+BENCHMARKS = {}
+
+
+def benchmark(name, max_size=None):
+    def register(func):
+        BENCHMARKS[name] = (func, max_size)
+        return func
+    return register
+
+
+def timeit(func, repeats=3):
+    """Best wall time of `repeats` calls, in seconds."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# --- Benchmarks: each takes a size and returns {"seconds": ..., "items": ...} ---
+@benchmark("match_grid")
+def bench_match_grid(n):
+    from risk_grid import build_index
+
+    index = build_index(synthetic.make_score_grid(10_000))
+    listings = synthetic.make_listings(n, synthetic.make_score_grid(10_000))
+    lat, lon = listings["nearest_lat"].to_numpy(), listings["nearest_lon"].to_numpy()
+    return {"seconds": timeit(lambda: index.lookup(lat, lon)), "items": n}
+
+
+@benchmark("match_bilinear")
+def bench_match_bilinear(n):
+    from risk_grid import build_index
+
+    index = build_index(synthetic.make_score_grid(10_000))
+    listings = synthetic.make_listings(n, synthetic.make_score_grid(10_000))
+    lat, lon = listings["nearest_lat"].to_numpy(), listings["nearest_lon"].to_numpy()
+    return {"seconds": timeit(lambda: index.lookup(lat, lon, method="bilinear")), "items": n}
+
+
+@benchmark("match_kdtree")
+def bench_match_kdtree(n):
+    from risk_grid import KDTreeIndex
+
+    grid = synthetic.make_score_grid(10_000)
+    index = KDTreeIndex(grid["lat"], grid["lon"], grid["std_score"])
+    listings = synthetic.make_listings(n, grid)
+    lat, lon = listings["nearest_lat"].to_numpy(), listings["nearest_lon"].to_numpy()
+    return {"seconds": timeit(lambda: index.lookup(lat, lon)), "items": n}
+
+
+@benchmark("capi_pricing")
+def bench_capi(n):
+    from pricing import capi_price
+
+    rng = np.random.default_rng(0)
+    price, crs = rng.lognormal(13, 0.5, n), rng.gamma(4, 0.07, n)
+    return {"seconds": timeit(lambda: capi_price(price, crs)), "items": n}
+
+
+@benchmark("linear_pricing")
+def bench_linear(n):
+    from pricing import linear_price, minmax_scale
+
+    rng = np.random.default_rng(0)
+    price, crs = rng.lognormal(13, 0.5, n), rng.gamma(4, 0.07, n)
+    return {"seconds": timeit(lambda: linear_price(price, minmax_scale(crs))), "items": n}
+
+
+@benchmark("map_bins")
+def bench_map_bins(n):
+    from risk_map import aggregate_bins, bin_size, fit_zoom
+
+    listings = synthetic.make_listings(n, synthetic.make_score_grid(10_000))
+    lat, lon = listings["nearest_lat"].to_numpy(), listings["nearest_lon"].to_numpy()
+    rng = np.random.default_rng(0)
+    score, adjustment = rng.random(n), rng.normal(0, 5, n)
+    cell_deg = bin_size(fit_zoom(lat, lon))
+    return {"seconds": timeit(lambda: aggregate_bins(lat, lon, score, adjustment, cell_deg)), "items": n}
+
+
+@benchmark("scenario_sweep", max_size=1_000_000)
+def bench_scenario_sweep(n):
+    from scenarios import ScenarioSweep, linear_scenarios
+
+    rng = np.random.default_rng(0)
+    price, crs = rng.lognormal(13, 0.5, n), rng.gamma(4, 0.07, n)
+    scenarios = linear_scenarios()
+    seconds = timeit(lambda: ScenarioSweep(price, crs, scenarios), repeats=1)
+    return {"seconds": seconds, "items": n * len(scenarios)}
+
+
+@benchmark("history_window", max_size=10_000_000)
+def bench_history_window(n):
+    import tempfile
+
+    import pandas as pd
+    from risk_history import build_history
+
+    # n weekly scores: 520 weeks (10 years) per cell; time a 2-year std_score window over every cell
+    grid = synthetic.make_score_grid(max(n // 520, 1))
+    weeks = pd.date_range("2015-01-04", periods=520, freq="7D")
+    risk_df = pd.DataFrame({
+        "time": np.repeat(weeks, len(grid)),
+        "lat": np.tile(grid["lat"].to_numpy(), len(weeks)),
+        "lon": np.tile(grid["lon"].to_numpy(), len(weeks)),
+        "risk_score_scaled_1_10": np.random.default_rng(0).uniform(1, 10, len(weeks) * len(grid)),
+    })
+    with tempfile.TemporaryDirectory() as tmp:
+        history = build_history(risk_df, tmp)
+        seconds = timeit(lambda: history.window_std("2018-01-01", "2019-12-31"))
+    return {"seconds": seconds, "items": len(risk_df)}
+
+
+@benchmark("dataset_build", max_size=10_000_000)
+def bench_dataset(n):
+    from weather_dataset import WeatherPredictionDataset
+
+    # n rows of weekly features: 260 weeks (5 years) per cell
+    df = synthetic.make_weekly_features(max(n // 260, 1), 260)
+    seconds = timeit(lambda: WeatherPredictionDataset(df, seq_len=8, pred_len=1), repeats=1)
+    return {"seconds": seconds, "items": len(df)}
+
+
+@benchmark("model_inference", max_size=1_000_000)
+def bench_inference(n):
+    import torch
+    from inference import score_windows
+    from risk_model import TransformerForecastModel
+    from weather_dataset import WeatherPredictionDataset
+
+    df = synthetic.make_weekly_features(max(n // 260, 1), 260)
+    dataset = WeatherPredictionDataset(df, seq_len=8, pred_len=1)
+    torch.manual_seed(0)
+    model = TransformerForecastModel(feature_dim=len(dataset.feature_cols))
+    seconds = timeit(lambda: score_windows(model, dataset), repeats=1)
+    return {"seconds": seconds, "items": len(dataset)}
+
+
+@benchmark("explain_cells", max_size=100_000)
+def bench_explain(n, k=20):
+    import torch
+    from explain import explain, latest_windows, summarize_background
+    from risk_model import TransformerForecastModel
+    from weather_dataset import WeatherPredictionDataset
+
+    # Attributions for the latest window of each of n / 260 cells, against a k-means background
+    df = synthetic.make_weekly_features(max(n // 260, 1), 260)
+    dataset = WeatherPredictionDataset(df, seq_len=8, pred_len=1)
+    torch.manual_seed(0)
+    model = TransformerForecastModel(feature_dim=len(dataset.feature_cols))
+    pool = np.arange(0, len(dataset), max(len(dataset) // 5000, 1))
+    background, weights = summarize_background(dataset.windows(pool).reshape(len(pool), -1), k)
+    idx = latest_windows(dataset)
+    seconds = timeit(lambda: explain(model, dataset, idx, background, weights), repeats=1)
+    return {"seconds": seconds, "items": len(idx), "background": k}
+
+
+@benchmark("fetch_mock", max_size=100_000)
+def bench_fetch(n, latency=0.05, page_size=200):
+    from mock_realtor import MockRealtorServer
+    from realtor import RealtorClient
+
+    # n listings spread over 42 ZIPs, as for the Phoenix metro
+    zips = [str(85000 + i) for i in range(42)]
+    with MockRealtorServer(listings_per_zip=max(n // len(zips), 1), latency=latency) as mock:
+        with RealtorClient("bench-key", url=mock.url, page_size=page_size) as client:
+            start = time.perf_counter()
+            df = client.fetch_listings(zips)
+            seconds = time.perf_counter() - start
+        n_requests = len(mock.requests)
+    return {"seconds": seconds, "items": len(df), "requests": n_requests, "latency": latency}
+
+
+@benchmark("refresh_mock", max_size=100_000)
+def bench_refresh(n, latency=0.05, throttle_rate=0.1, rate=20):
+    import tempfile
+
+    from listing_cache import ListingCache
+    from mock_realtor import MockRealtorServer
+    from refresher import ListingRefresher, make_client
+
+    # Background refresh of 42 ZIPs through the token bucket, with injected 429s
+    zips = [str(85000 + i) for i in range(42)]
+    with tempfile.TemporaryDirectory() as tmp, \
+            MockRealtorServer(listings_per_zip=max(n // len(zips), 1), latency=latency,
+                              throttle_rate=throttle_rate) as mock:
+        cache = ListingCache(os.path.join(tmp, "listings.sqlite"))
+        with make_client("bench-key", mock.url, rate=rate, burst=rate, backoff=0.05) as client:
+            refresher = ListingRefresher(client, cache, zips, batch_size=8)
+            start = time.perf_counter()
+            while refresher.run_once():
+                pass
+            seconds = time.perf_counter() - start
+        n_listings = len(cache.load(zips))
+        n_requests = len(mock.requests)
+    return {"seconds": seconds, "items": n_listings, "requests": n_requests,
+            "rate_limit": rate, "throttle_rate": throttle_rate}
+
+
+# --- Runner ---
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, only=None):
+    results = []
+    for name, (func, max_size) in BENCHMARKS.items():
+        if only and name not in only:
+            continue
+        for size in sizes:
+            if max_size is not None and size > max_size:
+                continue
+            try:
+                row = func(size)
+            except ImportError as e:
+                print(f"{name:<16} skipped ({e})")
+                break
+            row.update(name=name, size=size, items_per_s=row["items"] / row["seconds"])
+            results.append(row)
+            print(f"{name:<16} n={size:>10,}  {row['seconds'] * 1e3:>10.2f} ms  "
+                  f"{row['items_per_s']:>14,.0f} items/s")
+    return {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = {(r["name"], r["size"]): r for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+    for row in new:
+        before = old.get((row["name"], row["size"]))
+        if before is None:
+            continue
+        ratio = row["seconds"] / before["seconds"]
+        flag = "  <-- slower" if ratio > 1.1 else ""
+        print(f"{row['name']:<16} n={row['size']:>10,}  {ratio:>6.2f}x{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the pipeline benchmarks.")
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS))
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    report = run(args.sizes, args.only)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=1)
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+# Phoenix GridMET lattice (1/24 degree cells)
+LAT0, LON0, STEP = 33.275, -112.308333, 1 / 24
+
+
+def make_score_grid(n_cells, seed=0):
+    """A square-ish regular lattice of `n_cells` std_scores starting at the Phoenix origin."""
+    rng = np.random.default_rng(seed)
+    n_lat = max(int(np.sqrt(n_cells)), 1)
+    n_lon = max(n_cells // n_lat, 1)
+    lat, lon = np.meshgrid(LAT0 + STEP * np.arange(n_lat), LON0 + STEP * np.arange(n_lon), indexing="ij")
+    return pd.DataFrame({
+        "lat": lat.ravel(),
+        "lon": lon.ravel(),
+        "std_score": rng.gamma(4, 0.07, lat.size).astype(np.float32),
+    })
+
+
+def make_listings(n, df_scores=None, seed=0):
+    """Listings in the app's schema, scattered over the score grid's extent."""
+    rng = np.random.default_rng(seed)
+    if df_scores is None:
+        df_scores = make_score_grid(160)
+    lat = rng.uniform(df_scores["lat"].min(), df_scores["lat"].max(), n)
+    lon = rng.uniform(df_scores["lon"].min(), df_scores["lon"].max(), n)
+    return pd.DataFrame({
+        "address": [f"{i} Synthetic St" for i in range(n)],
+        "city": "Phoenix",
+        "zipcode": rng.choice(["85003", "85004", "85006", "85007"], n),
+        "base_price": rng.lognormal(13, 0.5, n).round(-3),
+        "nearest_lat": lat,
+        "nearest_lon": lon,
+        "beds": rng.integers(1, 6, n),
+        "baths": rng.integers(1, 4, n),
+        "lot_sqft": rng.integers(2000, 20000, n),
+        "type": rng.choice(["single_family", "condos", "townhomes"], n),
+        "url": None,
+        "property_id": np.arange(n).astype(str),
+        "list_date": None,
+    })
+
+
+def make_weekly_features(n_cells, n_weeks, n_features=5, seed=0):
+    """An `aggregated_df`-shaped frame: (time, lat, lon) plus grouped features."""
+    rng = np.random.default_rng(seed)
+    grid = make_score_grid(n_cells, seed)
+    time = pd.date_range("2017-01-01", periods=n_weeks, freq="W")
+    df = pd.DataFrame({
+        "time": np.tile(time, len(grid)),
+        "lat": np.repeat(grid["lat"].to_numpy(), n_weeks),
+        "lon": np.repeat(grid["lon"].to_numpy(), n_weeks),
+    })
+    for k in range(n_features):
+        df[f"f{k}"] = rng.normal(size=len(df)).astype(np.float32)
+    return df
+
+
+def make_realtor_home(zip_code, k, seed=0):
+    """One `/properties/v3/list` result, deterministic in (zip_code, k); higher k is listed later."""
+    rng = np.random.default_rng((seed, int(zip_code), k))
+    return {
+        "property_id": f"{zip_code}-{k}",
+        "list_price": int(rng.lognormal(13, 0.5)),
+        "list_date": (pd.Timestamp("2025-01-01") + pd.Timedelta(hours=k)).isoformat(),
+        "href": f"/realestateandhomes-detail/{zip_code}-{k}",
+        "location": {"address": {
+            "line": f"{k} Mock Ave",
+            "city": "Phoenix",
+            "postal_code": zip_code,
+            "coordinate": {"lat": float(rng.uniform(33.3, 33.9)), "lon": float(rng.uniform(-112.3, -111.95))},
+        }},
+        "description": {"beds": int(rng.integers(1, 6)), "baths": int(rng.integers(1, 4)),
+                        "lot_sqft": int(rng.integers(2000, 20000)), "type": "single_family"},
+    }
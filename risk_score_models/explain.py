@@ -0,0 +1,279 @@
+"""Batched SHAP attributions per grid cell, cached by model version.
+
+For every cell the latest input window is explained once, offline, against
+a background summarised with k-means (or a fixed random sample). The
+attributions are written under the model's version hash, so the app can
+answer "why is this property's risk high" with a lookup. By default the
+output explained is the risk score itself: the window's mean squared
+forecast error against its target week (as in inference.score_windows),
+with each cell's target held fixed while its inputs are varied. Files:
+
+    <out>/<version>/attributions.npy   (cells, seq_len * features) float32
+    <out>/<version>/cells.csv          cell, lat, lon, time, base_value, output (per cell)
+    <out>/<version>/meta.json          feature names, output, method, background
+    <out>/latest                       version most recently written
+
+    python explain.py --model risk_model.pt --features features --region phoenix --out ../streamlit/explanations
+
+`--method gradient` (expected gradients, batched through autograd) is the
+fast default for torch models; `--method permutation` works with any
+model, including ONNX exports.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import torch
+
+from inference import load_model
+from weather_dataset import WeatherPredictionDataset
+
+
+def model_version(path):
+    """Short content hash of a model file, so attributions follow the weights that produced them."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def feature_names(feature_cols, seq_len):
+    return [f"{v}_t-{i}" for i in range(seq_len)[::-1] for v in feature_cols]
+
+
+def _select(preds, output, targets=None):
+    # preds, targets: (batch, pred_len, features)
+    if output == "error":
+        return ((preds - targets) ** 2).mean(dim=(1, 2))
+    if output == "mean":
+        return preds.mean(dim=(1, 2))
+    return preds[:, 0, int(output)]
+
+
+class RiskModelWrapper:
+    """Flat (n, seq_len * features) inputs -> one model output per sample, for SHAP.
+
+    `output` is "error" (the risk score: mean squared error against
+    `targets`, one (pred_len, features) target per input row), "mean"
+    (mean forecast) or the index of one forecast feature.
+    """
+
+    def __init__(self, model, seq_len, feature_dim, output="error", batch_size=8192):
+        self.model = model
+        if isinstance(model, torch.nn.Module):
+            model.eval()
+        self.seq_len = seq_len
+        self.feature_dim = feature_dim
+        self.output = output
+        self.batch_size = batch_size
+
+    def __call__(self, X_flat, targets=None):
+        if self.output == "error" and targets is None:
+            raise ValueError("output='error' needs the target window of every row")
+        X = np.asarray(X_flat, dtype=np.float32).reshape(-1, self.seq_len, self.feature_dim)
+        out = np.empty(len(X), dtype=np.float32)
+        with torch.inference_mode():
+            for start in range(0, len(X), self.batch_size):
+                stop = start + self.batch_size
+                batch = torch.from_numpy(np.ascontiguousarray(X[start:stop]))
+                y = None if targets is None else torch.from_numpy(
+                    np.ascontiguousarray(targets[start:stop], dtype=np.float32))
+                out[start:start + len(batch)] = _select(self.model(batch), self.output, y).numpy()
+        return out
+
+    def expected(self, X_flat, background, weights, targets=None):
+        """Background-weighted mean output per row of X_flat, i.e. the SHAP base values."""
+        n, k = len(X_flat), len(background)
+        rows = np.broadcast_to(background, (n,) + background.shape).reshape(n * k, -1)
+        targets = None if targets is None else np.repeat(targets, k, axis=0)
+        return self(rows, targets).reshape(n, k) @ weights
+
+
+def summarize_background(X_flat, k=50, method="kmeans", seed=0):
+    """(k, n_features) background rows and their weights."""
+    X_flat = np.asarray(X_flat, dtype=np.float32)
+    k = min(k, len(X_flat))
+    if method == "kmeans":
+        from sklearn.cluster import KMeans
+
+        km = KMeans(n_clusters=k, n_init=3, random_state=seed).fit(X_flat)
+        weights = np.bincount(km.labels_, minlength=k) / len(X_flat)
+        return km.cluster_centers_.astype(np.float32), weights
+    if method == "sample":
+        idx = np.random.default_rng(seed).choice(len(X_flat), k, replace=False)
+        return X_flat[idx], np.full(k, 1 / k)
+    raise ValueError(f"Unknown background method: {method!r}")
+
+
+def latest_windows(dataset):
+    """Sample index of each cell's most recent window."""
+    return dataset.index.groupby("cell")["time"].idxmax().to_numpy()
+
+
+def expected_gradients(model, X, background, weights, output="error", targets=None, steps=8):
+    """Expected-gradients SHAP values for windows X (n, seq_len, features).
+
+    shap.GradientExplainer's estimator, with its random draws replaced by
+    every background row at `steps` midpoints along the path, weighted by
+    cluster size. All n * k * steps points go through the model in one
+    batch, and the values add up to f(x) minus the background mean up to
+    the quadrature error.
+    """
+    n, k = len(X), len(background)
+    X = torch.from_numpy(np.ascontiguousarray(X, dtype=np.float32))[:, None, None]
+    refs = torch.from_numpy(np.ascontiguousarray(background, dtype=np.float32))[None, :, None]
+    alphas = ((torch.arange(steps) + 0.5) / steps).reshape(1, 1, steps, 1, 1)
+    points = (refs + alphas * (X - refs)).reshape(n * k * steps, *X.shape[3:])
+    points.requires_grad_(True)
+    if targets is not None:
+        targets = torch.from_numpy(np.ascontiguousarray(targets, dtype=np.float32))
+        targets = targets.repeat_interleave(k * steps, dim=0)
+    (grads,) = torch.autograd.grad(_select(model(points), output, targets).sum(), points)
+    grads = grads.reshape(n, k, steps, *X.shape[3:]).mean(dim=2)
+    w = torch.as_tensor(weights, dtype=torch.float32).reshape(1, k, 1, 1)
+    return ((X[:, :, 0] - refs[:, :, 0]) * grads * w).sum(dim=1).reshape(n, -1).numpy()
+
+
+def permutation_values(f, X_flat, background, weights, targets=None, permutations=1, seed=0):
+    """Permutation-sampling SHAP values for flat rows X_flat (n, n_features).
+
+    Like shap.PermutationExplainer, each permutation is walked forwards and
+    backwards, so the values add up exactly to f(x) minus the background
+    mean; unlike it, all rows advance together, one batched call of n * k
+    masked rows per feature step.
+    """
+    rng = np.random.default_rng(seed)
+    n, d = X_flat.shape
+    k = len(background)
+    values = np.zeros((n, d))
+    # Every masked copy of a row is scored against that row's own target
+    targets = None if targets is None else np.repeat(targets, k, axis=0)
+
+    def expected(masked):
+        return f(masked.reshape(n * k, d), targets).reshape(n, k) @ weights
+
+    for _ in range(permutations):
+        order = rng.permutation(d)
+        for walk in (order, order[::-1]):
+            masked = np.repeat(background[None], n, axis=0)
+            prev = expected(masked)
+            for j in walk:
+                masked[:, :, j] = X_flat[:, None, j]
+                cur = expected(masked)
+                values[:, j] += cur - prev
+                prev = cur
+    return values / (2 * permutations)
+
+
+def explain(model, dataset, idx, background, weights=None, output="error", method="gradient",
+            batch_size=64, steps=8, seed=0):
+    """SHAP values (len(idx), seq_len * features), base values and outputs for samples `idx`.
+
+    The base value is per sample: with output="error" each sample's
+    expected error over the background is taken against its own target.
+    """
+    shape = (dataset.seq_len, len(dataset.feature_cols))
+    wrapper = RiskModelWrapper(model, *shape, output)
+    weights = np.full(len(background), 1 / len(background)) if weights is None else np.asarray(weights)
+    if method == "gradient" and not isinstance(model, torch.nn.Module):
+        raise ValueError("Gradient attributions need a torch model; use method='permutation'")
+    if method not in ("gradient", "permutation"):
+        raise ValueError(f"Unknown attribution method: {method!r}")
+
+    idx = np.asarray(idx)
+    values = np.empty((len(idx), shape[0] * shape[1]), dtype=np.float32)
+    base_values = np.empty(len(idx), dtype=np.float32)
+    outputs = np.empty(len(idx), dtype=np.float32)
+    for start in range(0, len(idx), batch_size):
+        batch = idx[start:start + batch_size]
+        X = np.ascontiguousarray(dataset.windows(batch))
+        y = np.ascontiguousarray(dataset.targets(batch)) if output == "error" else None
+        stop = start + len(X)
+        outputs[start:stop] = wrapper(X, y)
+        base_values[start:stop] = wrapper.expected(X.reshape(len(X), -1), background, weights, y)
+        if method == "gradient":
+            values[start:stop] = expected_gradients(
+                model, X, background.reshape(-1, *shape), weights, output, y, steps
+            )
+        else:
+            values[start:stop] = permutation_values(
+                wrapper, X.reshape(len(X), -1), background, weights, y, seed=seed + start
+            )
+    return values, base_values, outputs
+
+
+def write_explanations(out_dir, version, dataset, idx, values, base_values, outputs, meta):
+    path = os.path.join(out_dir, version)
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "attributions.npy"), values.astype(np.float32))
+    cells = dataset.index.iloc[idx][["cell", "lat", "lon", "time"]].reset_index(drop=True)
+    cells["base_value"] = base_values
+    cells["output"] = outputs
+    cells.to_csv(os.path.join(path, "cells.csv"), index=False)
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({
+            "version": version,
+            "feature_names": feature_names(dataset.feature_cols, dataset.seq_len),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            **meta,
+        }, f, indent=1)
+    tmp_path = os.path.join(out_dir, "latest.tmp")
+    with open(tmp_path, "w") as f:
+        f.write(version)
+    os.replace(tmp_path, os.path.join(out_dir, "latest"))
+    return path
+
+
+def main(argv=None):
+    from ingest import load_features
+
+    parser = argparse.ArgumentParser(description="Precompute per-cell SHAP attributions for a risk model.")
+    parser.add_argument("--model", default="risk_model.pt", help=".pt state dict, .ts TorchScript or .onnx")
+    parser.add_argument("--features", default="features", help="feature store root (see ingest.py)")
+    parser.add_argument("--region", required=True)
+    parser.add_argument("--start")
+    parser.add_argument("--end")
+    parser.add_argument("--seq-len", type=int, default=8)
+    parser.add_argument("--output", default="error",
+                        help='"error" (the risk score), "mean" forecast or a forecast feature index')
+    parser.add_argument("--method", choices=["gradient", "permutation"], default="gradient")
+    parser.add_argument("--background", choices=["kmeans", "sample"], default="kmeans")
+    parser.add_argument("--background-size", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=64, help="cells explained per batch")
+    parser.add_argument("--out", default="explanations")
+    parser.add_argument("--force", action="store_true", help="recompute even if this model version is cached")
+    args = parser.parse_args(argv)
+
+    version = model_version(args.model)
+    if os.path.exists(os.path.join(args.out, version, "meta.json")) and not args.force:
+        print(f"Attributions for model {version} already in {args.out}")
+        return
+
+    model = load_model(args.model)
+    df = load_features(args.features, args.region, args.start, args.end)
+    dataset = WeatherPredictionDataset(df, seq_len=args.seq_len, pred_len=1)
+    output = args.output if args.output in ("error", "mean") else int(args.output)
+
+    # Summarise at most 20k windows; k-means over every window adds little
+    rng = np.random.default_rng(0)
+    pool = rng.choice(len(dataset), min(len(dataset), 20_000), replace=False)
+    background, weights = summarize_background(
+        dataset.windows(np.sort(pool)).reshape(len(pool), -1), args.background_size, args.background
+    )
+    idx = latest_windows(dataset)
+    values, base_values, outputs = explain(
+        model, dataset, idx, background, weights, output, args.method, args.batch_size
+    )
+    path = write_explanations(args.out, version, dataset, idx, values, base_values, outputs, {
+        "output": output, "method": args.method, "background": args.background,
+        "background_size": len(background), "region": args.region,
+    })
+    print(f"Explained {len(idx)} cells -> {path}")
+
+
+if __name__ == "__main__":
+    main()
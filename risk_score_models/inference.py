@@ -0,0 +1,155 @@
+"""Deterministic, batched risk scoring with a trained TransformerForecastModel.
+
+Scores come back in dataset order, one row per (cell, time) sample, so
+they can be joined to coordinates without relying on loader order. The
+model loads from a state dict (risk_model.pt), a TorchScript file (.ts)
+or an ONNX export (.onnx), so new weeks can be scored without retraining.
+
+    python inference.py --model risk_model.pt --features features --region phoenix --out scores.csv
+    python inference.py --model risk_model.ts --features features --region phoenix --benchmark
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import torch
+
+from risk_model import TransformerForecastModel
+from weather_dataset import WeatherPredictionDataset
+
+
+class OnnxModel:
+    """Callable wrapper so an ONNX export can stand in for the torch model."""
+
+    def __init__(self, path, num_threads=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x):
+        (out,) = self.session.run(None, {self.input_name: x.numpy()})
+        return torch.from_numpy(out)
+
+
+def load_model(path, n_heads=4, num_threads=None):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".onnx":
+        return OnnxModel(path, num_threads)
+    if ext in (".ts", ".torchscript"):
+        model = torch.jit.load(path, map_location="cpu")
+    else:
+        state = torch.load(path, map_location="cpu")
+        model = TransformerForecastModel.from_state_dict(state, n_heads=n_heads)
+    model.eval()
+    return model
+
+
+def export_torchscript(model, path, seq_len=8):
+    model.eval()
+    example = torch.zeros(1, seq_len, model.feature_dim)
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example, check_trace=False)
+    traced.save(path)
+
+
+def export_onnx(model, path, seq_len=8):
+    model.eval()
+    example = torch.zeros(1, seq_len, model.feature_dim)
+    torch.onnx.export(
+        model, example, path,
+        input_names=["x"], output_names=["pred"],
+        dynamic_axes={"x": {0: "batch"}, "pred": {0: "batch"}},
+    )
+
+
+def score_windows(model, dataset, batch_size=1024, num_threads=None):
+    """Mean squared one-step forecast error per sample, in dataset order.
+
+    `num_threads` applies to this call only; the caller's torch thread
+    count is restored afterwards.
+    """
+    previous_threads = torch.get_num_threads()
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    if isinstance(model, torch.nn.Module):
+        model.eval()
+
+    try:
+        scores = np.empty(len(dataset), dtype=np.float32)
+        with torch.inference_mode():
+            for start in range(0, len(dataset), batch_size):
+                idx = np.arange(start, min(start + batch_size, len(dataset)))
+                X = torch.from_numpy(np.ascontiguousarray(dataset.windows(idx)))
+                y = torch.from_numpy(np.ascontiguousarray(dataset.targets(idx)))
+                preds = model(X)
+                scores[idx] = ((preds - y) ** 2).mean(dim=(1, 2)).numpy()
+    finally:
+        torch.set_num_threads(previous_threads)
+    return scores
+
+
+def score_dataset(model, dataset, batch_size=1024, num_threads=None):
+    """Returns `dataset.index` (cell, time, lat, lon) with a `risk_score` column."""
+    risk_df = dataset.index.copy()
+    risk_df["risk_score"] = score_windows(model, dataset, batch_size, num_threads)
+    return risk_df
+
+
+def benchmark(model, dataset, batch_sizes=(256, 1024, 4096), threads=(1, None), repeats=3):
+    """CPU scoring throughput (samples/s) for each batch size and thread count."""
+    results = []
+    default_threads = torch.get_num_threads()
+    for n_threads in threads:
+        for batch_size in batch_sizes:
+            best = float("inf")
+            for _ in range(repeats):
+                start = time.perf_counter()
+                score_windows(model, dataset, batch_size, n_threads or default_threads)
+                best = min(best, time.perf_counter() - start)
+            results.append({
+                "threads": n_threads or default_threads,
+                "batch_size": batch_size,
+                "seconds": best,
+                "samples_per_s": len(dataset) / best,
+            })
+    return results
+
+
+def main(argv=None):
+    from ingest import load_features
+
+    parser = argparse.ArgumentParser(description="Score weekly features with a trained risk model.")
+    parser.add_argument("--model", default="risk_model.pt", help=".pt state dict, .ts TorchScript or .onnx")
+    parser.add_argument("--features", default="features", help="feature store root (see ingest.py)")
+    parser.add_argument("--region", required=True)
+    parser.add_argument("--start")
+    parser.add_argument("--end")
+    parser.add_argument("--seq-len", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--threads", type=int)
+    parser.add_argument("--out", default="risk_scores.csv")
+    parser.add_argument("--benchmark", action="store_true")
+    args = parser.parse_args(argv)
+
+    model = load_model(args.model, num_threads=args.threads)
+    df = load_features(args.features, args.region, args.start, args.end)
+    dataset = WeatherPredictionDataset(df, seq_len=args.seq_len, pred_len=1)
+
+    if args.benchmark:
+        for row in benchmark(model, dataset):
+            print(f"threads={row['threads']:>2} batch={row['batch_size']:>5} "
+                  f"{row['samples_per_s']:>12,.0f} samples/s")
+        return
+
+    risk_df = score_dataset(model, dataset, args.batch_size, args.threads)
+    risk_df.to_csv(args.out, index=False)
+    print(f"Scored {len(risk_df)} samples -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""Chunked GridMET ingestion into a partitioned Parquet feature store.
+
+The zarr store is read lazily (dask chunks) and processed one
+(time block x lat/lon tile) at a time, so memory is bounded by the tile
+size rather than the region. Each block is resampled to weeks, and the
+grouped features are reduced to one component per group with a
+StandardScaler + IncrementalPCA fitted by partial fits. The result (the
+notebook's `aggregated_df`) is written as
+
+    <out>/region=<region>/year=<yyyy>/part-<block start>-<tile>.parquet
+
+    python ingest.py --region phoenix --bbox -112.33 33.29 -111.92 33.92 --out features
+    python ingest.py --store local.zarr --region test --out features
+"""
+import argparse
+import glob
+import os
+import pickle
+import shutil
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+from sklearn.decomposition import IncrementalPCA
+from sklearn.preprocessing import StandardScaler
+
+VARIABLES = [
+    "air_temperature", "burning_index_g", "dead_fuel_moisture_100hr",
+    "dead_fuel_moisture_1000hr", "mean_vapor_pressure_deficit", "potential_evapotranspiration",
+    "precipitation_amount", "relative_humidity", "specific_humidity",
+    "surface_downwelling_shortwave_flux_in_air", "wind_from_direction", "wind_speed"
+]
+
+GROUPED_FEATURES = {
+    'temp_humidity': ['air_temperature', 'specific_humidity', 'relative_humidity'],
+    'fuel_moisture': ['dead_fuel_moisture_100hr', 'dead_fuel_moisture_1000hr'],
+    'wind': ['wind_speed', 'wind_from_direction', 'mean_vapor_pressure_deficit'],
+    'precip_solar': ['precipitation_amount', 'surface_downwelling_shortwave_flux_in_air'],
+    'fire_risk': ['burning_index_g']
+}
+
+
+# --- Reading ---
+def open_gridmet(store=None, variables=VARIABLES, start="2017-01-01", end=None, bbox=None,
+                 chunks=None):
+    """Opens GridMET lazily. `store=None` uses the Planetary Computer zarr, as in the notebook."""
+    kwargs = {}
+    if store is None:
+        import planetary_computer
+        import pystac_client
+
+        catalog = pystac_client.Client.open(
+            "https://planetarycomputer.microsoft.com/api/stac/v1",
+            modifier=planetary_computer.sign_inplace,
+        )
+        asset = catalog.get_collection("gridmet").assets["zarr-abfs"]
+        store = asset.href
+        kwargs = dict(asset.extra_fields.get("xarray:open_kwargs", {}))
+        kwargs["storage_options"] = asset.extra_fields.get("xarray:storage_options", {})
+    kwargs["chunks"] = chunks if chunks is not None else {}
+
+    ds = xr.open_dataset(store, engine="zarr", **kwargs)
+    ds = ds[variables].sel(time=slice(start, end))
+    return clip_bbox(ds, bbox) if bbox is not None else ds
+
+
+def clip_bbox(ds, bbox):
+    minx, miny, maxx, maxy = bbox
+    # GridMET stores latitude north to south
+    descending = ds.lat.size > 1 and float(ds.lat[0]) > float(ds.lat[-1])
+    lat = slice(maxy, miny) if descending else slice(miny, maxy)
+    return ds.sel(lat=lat, lon=slice(minx, maxx))
+
+
+def week_blocks(ds, weeks_per_block=52):
+    """Integer time slices that each cover whole weeks, so per-block resampling is exact."""
+    weeks = ds.time.to_index().to_period("W-SUN")
+    starts = np.flatnonzero(np.r_[True, weeks[1:] != weeks[:-1]])
+    bounds = np.r_[starts[::weeks_per_block], ds.sizes["time"]]
+    return [slice(a, b) for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+def iter_weekly_blocks(ds, tile=32, weeks_per_block=52):
+    """Yields (key, weekly DataFrame) one (time block, tile) at a time.
+
+    The key names the block by its first day and tile position, so
+    re-ingesting the same range overwrites rather than duplicates.
+    """
+    times = ds.time.to_index()
+    for time_slice in week_blocks(ds, weeks_per_block):
+        for i in range(0, ds.sizes["lat"], tile):
+            for j in range(0, ds.sizes["lon"], tile):
+                block = ds.isel(time=time_slice, lat=slice(i, i + tile), lon=slice(j, j + tile))
+                weekly = block.resample(time="1W").mean().load()
+                df = weekly.to_dataframe().dropna().reset_index()
+                if len(df):
+                    key = f"{times[time_slice.start]:%Y%m%d}-{i // tile:04d}-{j // tile:04d}"
+                    yield key, df[["time", "lat", "lon"] + list(ds.data_vars)]
+
+
+# --- Grouped feature reduction ---
+class GroupReducer:
+    """Per-group StandardScaler + 1-component PCA, fitted incrementally."""
+
+    def __init__(self, groups=GROUPED_FEATURES):
+        self.groups = groups
+        self.scalers = {name: StandardScaler() for name in groups}
+        self.pcas = {name: IncrementalPCA(n_components=1) for name in groups}
+
+    def partial_fit_scaler(self, df):
+        for name, features in self.groups.items():
+            self.scalers[name].partial_fit(df[features].fillna(0).to_numpy())
+
+    def partial_fit_pca(self, df):
+        for name, features in self.groups.items():
+            scaled = self.scalers[name].transform(df[features].fillna(0).to_numpy())
+            self.pcas[name].partial_fit(scaled)
+
+    def transform(self, df):
+        out = df[["time", "lat", "lon"]].copy()
+        for name, features in self.groups.items():
+            scaled = self.scalers[name].transform(df[features].fillna(0).to_numpy())
+            out[name] = self.pcas[name].transform(scaled)[:, 0].astype(np.float32)
+        return out
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            pickle.dump(self, f)
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+
+# --- Feature store ---
+def region_dir(root, region):
+    return os.path.join(root, f"region={region}")
+
+
+def ingest(ds, root, region, reducer=None, tile=32, weeks_per_block=52):
+    """Writes the weekly grouped features of `ds` under `root` for `region`.
+
+    Weekly blocks are staged to disk once, so the scaler and PCA passes
+    don't resample the raw data again. Pass a fitted `reducer` (e.g. the
+    one saved by an earlier run) to only transform new weeks; start such a
+    run at a week boundary after the last ingested week.
+    """
+    out_dir = region_dir(root, region)
+    staging = os.path.join(out_dir, "_staging")
+    os.makedirs(staging, exist_ok=True)
+
+    fit = reducer is None
+    reducer = reducer or GroupReducer()
+    parts = []
+    for key, df in iter_weekly_blocks(ds, tile, weeks_per_block):
+        path = os.path.join(staging, f"part-{key}.parquet")
+        df.to_parquet(path, index=False)
+        parts.append(path)
+        if fit:
+            reducer.partial_fit_scaler(df)
+
+    if fit:
+        for path in parts:
+            reducer.partial_fit_pca(pd.read_parquet(path))
+        reducer.save(os.path.join(out_dir, "reducer.pkl"))
+
+    n_rows = 0
+    for path in parts:
+        features = reducer.transform(pd.read_parquet(path))
+        years = features["time"].dt.year
+        for year, chunk in features.groupby(years):
+            year_dir = os.path.join(out_dir, f"year={year}")
+            os.makedirs(year_dir, exist_ok=True)
+            chunk.to_parquet(os.path.join(year_dir, os.path.basename(path)), index=False)
+        n_rows += len(features)
+
+    shutil.rmtree(staging)
+    return n_rows
+
+
+def load_features(root, region, start=None, end=None, bbox=None):
+    """Reads back only the year partitions (and rows) needed for the requested slice."""
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    paths = []
+    for year_dir in sorted(glob.glob(os.path.join(region_dir(root, region), "year=*"))):
+        year = int(year_dir.rsplit("=", 1)[1])
+        if (start is not None and year < start.year) or (end is not None and year > end.year):
+            continue
+        paths.extend(sorted(glob.glob(os.path.join(year_dir, "*.parquet"))))
+    if not paths:
+        return pd.DataFrame(columns=["time", "lat", "lon"] + list(GROUPED_FEATURES))
+
+    filters = []
+    if start is not None:
+        filters.append(("time", ">=", start))
+    if end is not None:
+        filters.append(("time", "<=", end))
+    if bbox is not None:
+        minx, miny, maxx, maxy = bbox
+        filters += [("lon", ">=", minx), ("lon", "<=", maxx), ("lat", ">=", miny), ("lat", "<=", maxy)]
+
+    df = pd.concat(
+        [pd.read_parquet(p, filters=filters or None) for p in paths], ignore_index=True
+    )
+    return df.sort_values(["time", "lat", "lon"]).reset_index(drop=True)
+
+
+# --- Synthetic data for local runs ---
+def synthetic_gridmet(n_lat=8, n_lon=6, start="2017-01-01", periods=400, seed=0,
+                      lat0=33.9, lon0=-112.3, step=1 / 24):
+    """A small GridMET-shaped Dataset (daily, lat descending) to run ingestion without network access."""
+    rng = np.random.default_rng(seed)
+    time = pd.date_range(start, periods=periods, freq="D")
+    lat = lat0 - step * np.arange(n_lat)
+    lon = lon0 + step * np.arange(n_lon)
+    season = np.sin(2 * np.pi * time.dayofyear.to_numpy() / 365.25)[:, None, None]
+    data = {}
+    for k, name in enumerate(VARIABLES):
+        noise = rng.normal(size=(periods, n_lat, n_lon))
+        data[name] = (("time", "lat", "lon"), (10 * (k + 1) * (1 + season) + noise).astype(np.float32))
+    return xr.Dataset(data, coords={"time": time, "lat": lat, "lon": lon})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest GridMET into the weekly feature store.")
+    parser.add_argument("--store", help="zarr path/URL (defaults to the Planetary Computer GridMET)")
+    parser.add_argument("--region", required=True)
+    parser.add_argument("--bbox", nargs=4, type=float, metavar=("MINX", "MINY", "MAXX", "MAXY"))
+    parser.add_argument("--start", default="2017-01-01")
+    parser.add_argument("--end")
+    parser.add_argument("--out", default="features")
+    parser.add_argument("--tile", type=int, default=32, help="lat/lon cells per tile")
+    parser.add_argument("--weeks-per-block", type=int, default=52)
+    parser.add_argument("--reducer", help="reuse a fitted reducer.pkl instead of fitting")
+    args = parser.parse_args(argv)
+
+    ds = open_gridmet(args.store, start=args.start, end=args.end, bbox=args.bbox,
+                      chunks={"time": 7 * args.weeks_per_block, "lat": args.tile, "lon": args.tile})
+    reducer = GroupReducer.load(args.reducer) if args.reducer else None
+    n_rows = ingest(ds, args.out, args.region, reducer, args.tile, args.weeks_per_block)
+    print(f"Wrote {n_rows} weekly rows to {region_dir(args.out, args.region)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import torch.nn as nn
+
+
+class TransformerForecastModel(nn.Module):
+    def __init__(self, feature_dim, hidden_dim=64, n_heads=4, n_layers=2, dropout=0.1, pred_len=1):
+        super().__init__()
+        self.embedding = nn.Linear(feature_dim, hidden_dim)
+        encoder_layer = nn.TransformerEncoderLayer(d_model=hidden_dim, nhead=n_heads, dropout=dropout, batch_first=True)
+        self.encoder = nn.TransformerEncoder(encoder_layer, num_layers=n_layers)
+        self.predictor = nn.Linear(hidden_dim, feature_dim * pred_len)
+        self.feature_dim = feature_dim
+        self.pred_len = pred_len
+
+    def forward(self, x):
+        x = self.embedding(x)
+        x = self.encoder(x)
+        x = x[:, -1, :]  # last time step
+        out = self.predictor(x)
+        return out.view(-1, self.pred_len, self.feature_dim)
+
+    @classmethod
+    def from_state_dict(cls, state, n_heads=4, dropout=0.1):
+        """Rebuilds the architecture from a saved state dict (e.g. risk_model.pt)."""
+        hidden_dim, feature_dim = state["embedding.weight"].shape
+        pred_len = state["predictor.weight"].shape[0] // feature_dim
+        n_layers = len({key.split(".")[2] for key in state if key.startswith("encoder.layers.")})
+        model = cls(feature_dim, hidden_dim, n_heads, n_layers, dropout, pred_len)
+        model.load_state_dict(state)
+        return model
@@ -0,0 +1,119 @@
+"""Streaming per-cell `std_score` with Welford/Chan accumulators.
+
+The batch pipeline min-max scales every risk score to 1-10 and takes the
+per-cell standard deviation. Scaling is affine, so the std of the scaled
+scores equals 9 * std(raw) / (max - min). It is enough to keep, per cell,
+the running count / mean / M2 of the raw scores plus the global min/max.
+A new week then folds in at O(cells) cost, and the result matches the
+batch computation without rereading history.
+
+    python score_aggregator.py --state score_state.npz --scores new_weeks.csv --out phoenix_scores.csv
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+
+class CellScoreAggregator:
+    def __init__(self, feature_range=(1, 10)):
+        self.feature_range = feature_range
+        self.cells = pd.MultiIndex.from_arrays([[], []], names=["lat", "lon"])
+        self.count = np.zeros(0, dtype=np.int64)
+        self.mean = np.zeros(0, dtype=np.float64)
+        self.m2 = np.zeros(0, dtype=np.float64)
+        self.min = np.inf
+        self.max = -np.inf
+
+    def _cell_codes(self, lat, lon):
+        keys = pd.MultiIndex.from_arrays([lat, lon], names=["lat", "lon"])
+        codes = self.cells.get_indexer(keys)
+        new = codes < 0
+        if new.any():
+            added = keys[new].unique()
+            self.cells = self.cells.append(added)
+            self.count = np.r_[self.count, np.zeros(len(added), dtype=np.int64)]
+            self.mean = np.r_[self.mean, np.zeros(len(added))]
+            self.m2 = np.r_[self.m2, np.zeros(len(added))]
+            codes[new] = self.cells.get_indexer(keys[new])
+        return codes
+
+    def update(self, risk_df, score_col="risk_score"):
+        """Folds a batch of (lat, lon, risk_score) rows into the running state."""
+        scores = risk_df[score_col].to_numpy(dtype=np.float64)
+        if len(scores) == 0:
+            return self
+        codes = self._cell_codes(risk_df["lat"].to_numpy(), risk_df["lon"].to_numpy())
+        n_cells = len(self.cells)
+
+        # Per-cell stats of the batch (two-pass, so the batch M2 is stable too)
+        n_b = np.bincount(codes, minlength=n_cells)
+        has = n_b > 0
+        mean_b = np.zeros(n_cells)
+        mean_b[has] = np.bincount(codes, weights=scores, minlength=n_cells)[has] / n_b[has]
+        m2_b = np.bincount(codes, weights=(scores - mean_b[codes]) ** 2, minlength=n_cells)
+
+        # Chan et al. merge of (count, mean, M2) pairs
+        n_a = self.count
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.mean = np.where(has, self.mean + delta * n_b / np.maximum(n, 1), self.mean)
+            self.m2 = self.m2 + m2_b + np.where(has, delta ** 2 * n_a * n_b / np.maximum(n, 1), 0)
+        self.count = n
+
+        self.min = min(self.min, scores.min())
+        self.max = max(self.max, scores.max())
+        return self
+
+    def std_scores(self):
+        """Per-cell std of the 1-10 scaled scores, like the batch `df_std` (NaN below 2 samples)."""
+        lo, hi = self.feature_range
+        spread = self.max - self.min
+        factor = (hi - lo) / spread if spread > 0 else 0.0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            std = np.where(self.count > 1, np.sqrt(self.m2 / (self.count - 1)), np.nan)
+        df = self.cells.to_frame(index=False)
+        df["std_score"] = std * factor
+        return df.sort_values(["lat", "lon"]).reset_index(drop=True)
+
+    def save(self, path):
+        np.savez(
+            path,
+            lat=self.cells.get_level_values("lat").to_numpy(dtype=np.float64),
+            lon=self.cells.get_level_values("lon").to_numpy(dtype=np.float64),
+            count=self.count, mean=self.mean, m2=self.m2,
+            min=self.min, max=self.max, feature_range=np.asarray(self.feature_range),
+        )
+
+    @classmethod
+    def load(cls, path):
+        state = np.load(path)
+        agg = cls(tuple(state["feature_range"].tolist()))
+        agg.cells = pd.MultiIndex.from_arrays([state["lat"], state["lon"]], names=["lat", "lon"])
+        agg.count = state["count"]
+        agg.mean = state["mean"]
+        agg.m2 = state["m2"]
+        agg.min = float(state["min"])
+        agg.max = float(state["max"])
+        return agg
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fold new weekly risk scores into std_score.")
+    parser.add_argument("--state", default="score_state.npz")
+    parser.add_argument("--scores", nargs="+", required=True, help="CSV(s) with lat, lon, risk_score")
+    parser.add_argument("--out", default="phoenix_scores.csv")
+    args = parser.parse_args(argv)
+
+    agg = CellScoreAggregator.load(args.state) if os.path.exists(args.state) else CellScoreAggregator()
+    for path in args.scores:
+        agg.update(pd.read_csv(path))
+    agg.save(args.state)
+    agg.std_scores().to_csv(args.out)
+    print(f"Updated {len(agg.cells)} cells -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+import torch
+
+from inference import score_dataset
+from ingest import ingest, load_features, open_gridmet, synthetic_gridmet
+from risk_model import TransformerForecastModel
+from score_aggregator import CellScoreAggregator
+from weather_dataset import WeatherPredictionDataset
+
+
+@pytest.fixture(scope="module")
+def risk_df(tmp_path_factory):
+    # Synthetic GridMET zarr -> weekly features -> per-week risk scores, as in the notebook
+    root = tmp_path_factory.mktemp("gridmet")
+    synthetic_gridmet(n_lat=6, n_lon=5, periods=400).to_zarr(root / "gridmet.zarr")
+    ingest(open_gridmet(str(root / "gridmet.zarr")), str(root / "features"), "test", tile=4)
+    dataset = WeatherPredictionDataset(load_features(str(root / "features"), "test"), seq_len=8)
+    torch.manual_seed(0)
+    model = TransformerForecastModel(feature_dim=len(dataset.feature_cols))
+    return score_dataset(model, dataset)
+
+
+def batch_std_scores(risk_df, feature_range=(1, 10)):
+    lo, hi = feature_range
+    score = risk_df["risk_score"].astype(np.float64)
+    scaled = lo + (score - score.min()) * (hi - lo) / (score.max() - score.min())
+    df_std = risk_df.assign(scaled=scaled).groupby(["lat", "lon"])["scaled"].std()
+    return df_std.reset_index(name="std_score").sort_values(["lat", "lon"]).reset_index(drop=True)
+
+
+def test_streaming_matches_batch(risk_df, tmp_path):
+    weeks = np.sort(risk_df["time"].unique())
+    agg = CellScoreAggregator()
+    for k, week in enumerate(weeks):
+        agg.update(risk_df[risk_df["time"] == week])
+        if k == len(weeks) // 2:
+            # Resume from saved state halfway, as a weekly job would
+            agg.save(tmp_path / "state.npz")
+            agg = CellScoreAggregator.load(tmp_path / "state.npz")
+
+    expected = batch_std_scores(risk_df)
+    streamed = agg.std_scores()
+    np.testing.assert_array_equal(streamed[["lat", "lon"]], expected[["lat", "lon"]])
+    np.testing.assert_allclose(streamed["std_score"], expected["std_score"], rtol=1e-9, atol=1e-12)
+
+
+def test_batch_order_does_not_matter(risk_df):
+    shuffled = risk_df.sample(frac=1, random_state=0)
+    agg = CellScoreAggregator()
+    for start in range(0, len(shuffled), 97):
+        agg.update(shuffled.iloc[start:start + 97])
+    expected = batch_std_scores(risk_df)
+    np.testing.assert_allclose(agg.std_scores()["std_score"], expected["std_score"], rtol=1e-9, atol=1e-12)
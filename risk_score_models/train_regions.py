@@ -0,0 +1,234 @@
+"""Train and score one risk model per region, in parallel over a process pool.
+
+Each region's weekly features come from the feature store (see ingest.py).
+A worker process trains its region's model with `--threads` torch threads,
+scores every sample and writes:
+
+    <out>/region=<region>/checkpoint.pt     model + optimizer after each epoch (resume point)
+    <out>/region=<region>/risk_model.pt     trained state dict
+    <out>/region=<region>/risk_scores.parquet
+    <out>/region=<region>/std_scores.csv    lat, lon, std_score (scaled 1-10 within the region)
+    <out>/region=<region>/score_state.npz   streaming aggregator state (score_aggregator.py)
+    <out>/region=<region>/_SUCCESS          written last; the region is skipped on rerun
+
+and the finished regions are merged into <out>/std_scores.csv.
+
+    python train_regions.py --features features --out runs --workers 4 --threads 2
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torch.utils.data import DataLoader
+
+from inference import score_dataset
+from risk_model import TransformerForecastModel
+from score_aggregator import CellScoreAggregator
+from weather_dataset import WeatherPredictionDataset
+
+SUCCESS = "_SUCCESS"
+
+
+def train_and_score(df, seq_len=8, pred_len=1, epochs=10, batch_size=64, lr=1e-3,
+                    checkpoint_path=None, seed=None, log=print):
+    """Trains a TransformerForecastModel on `df` and scores every sample.
+
+    Returns (risk_scores, model, dataset). With `checkpoint_path`, the
+    model and optimizer are saved after every epoch and training resumes
+    from the last saved epoch.
+    """
+    if seed is not None:
+        torch.manual_seed(seed)
+    dataset = WeatherPredictionDataset(df, seq_len, pred_len)
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=True)
+
+    model = TransformerForecastModel(feature_dim=len(dataset.feature_cols), pred_len=pred_len)
+    optimizer = optim.Adam(model.parameters(), lr=lr)
+    loss_fn = nn.MSELoss()
+
+    first_epoch = 0
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        checkpoint = torch.load(checkpoint_path, map_location="cpu")
+        model.load_state_dict(checkpoint["model"])
+        optimizer.load_state_dict(checkpoint["optimizer"])
+        first_epoch = checkpoint["epoch"]
+        log(f"Resuming from epoch {first_epoch}")
+
+    log("Training model...")
+    for epoch in range(first_epoch, epochs):
+        model.train()
+        for X_batch, y_batch in loader:
+            preds = model(X_batch)
+            loss = loss_fn(preds, y_batch)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+        log(f"Epoch {epoch+1}/{epochs} - Loss: {loss.item():.4f}")
+        if checkpoint_path:
+            tmp_path = checkpoint_path + ".tmp"
+            torch.save({"model": model.state_dict(), "optimizer": optimizer.state_dict(),
+                        "epoch": epoch + 1}, tmp_path)
+            os.replace(tmp_path, checkpoint_path)
+
+    log("Scoring risk...")
+    risk_scores = score_dataset(model, dataset)["risk_score"].to_numpy()
+    return risk_scores, model, dataset
+
+
+# --- Per-region worker ---
+def region_out(out_dir, region):
+    return os.path.join(out_dir, f"region={region}")
+
+
+def is_done(out_dir, region):
+    return os.path.exists(os.path.join(region_out(out_dir, region), SUCCESS))
+
+
+def _init_worker(threads):
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+
+
+def train_region(features_root, region, out_dir, seq_len=8, epochs=10, batch_size=64,
+                 start=None, end=None, seed=0):
+    """Trains, scores and checkpoints one region; returns a summary dict."""
+    from ingest import load_features
+
+    began = time.perf_counter()
+    out = region_out(out_dir, region)
+    os.makedirs(out, exist_ok=True)
+    df = load_features(features_root, region, start, end)
+    if df.empty:
+        raise ValueError(f"No features for region {region!r} under {features_root}")
+
+    risk_scores, model, dataset = train_and_score(
+        df, seq_len=seq_len, epochs=epochs, batch_size=batch_size, seed=seed,
+        checkpoint_path=os.path.join(out, "checkpoint.pt"),
+        log=lambda message: print(f"[{region}] {message}", flush=True),
+    )
+    torch.save(model.state_dict(), os.path.join(out, "risk_model.pt"))
+
+    risk_df = dataset.index.copy()
+    risk_df["risk_score"] = risk_scores
+    risk_df.to_parquet(os.path.join(out, "risk_scores.parquet"), index=False)
+    aggregator = CellScoreAggregator(feature_range=(1, 10)).update(risk_df)
+    aggregator.save(os.path.join(out, "score_state.npz"))
+    aggregator.std_scores().to_csv(os.path.join(out, "std_scores.csv"), index=False)
+
+    summary = {
+        "region": region, "rows": len(df), "samples": len(dataset), "cells": len(aggregator.cells),
+        "epochs": epochs, "threads": torch.get_num_threads(),
+        "seconds": round(time.perf_counter() - began, 3),
+    }
+    with open(os.path.join(out, SUCCESS), "w") as f:
+        json.dump(summary, f, indent=1)
+    return summary
+
+
+# --- Orchestration ---
+def list_regions(features_root):
+    return sorted(os.path.basename(p).split("=", 1)[1]
+                  for p in glob.glob(os.path.join(features_root, "region=*")))
+
+
+def merge_scores(out_dir, regions):
+    """Concatenates finished regions' std_scores into one (lat, lon, std_score, region) table.
+
+    A cell covered by several regions keeps the score of the last region listed.
+    """
+    frames = []
+    for region in regions:
+        if is_done(out_dir, region):
+            df = pd.read_csv(os.path.join(region_out(out_dir, region), "std_scores.csv"))
+            frames.append(df.assign(region=region))
+    if not frames:
+        return pd.DataFrame(columns=["lat", "lon", "std_score", "region"])
+    merged = pd.concat(frames, ignore_index=True)
+    merged = merged.drop_duplicates(["lat", "lon"], keep="last")
+    return merged.sort_values(["lat", "lon"]).reset_index(drop=True)
+
+
+def train_regions(features_root, out_dir, regions=None, workers=None, threads=None, force=False,
+                  **train_kwargs):
+    """Trains every pending region on a process pool and writes the merged score table.
+
+    `workers` defaults to one per CPU divided by `threads` torch threads each,
+    so the pool fills the machine without oversubscribing it.
+    """
+    regions = regions or list_regions(features_root)
+    cpus = os.cpu_count() or 1
+    if workers is None:
+        workers = max(1, cpus // (threads or 1))
+    threads = threads or max(1, cpus // workers)
+
+    pending = [r for r in regions if force or not is_done(out_dir, r)]
+    for region in (r for r in regions if r not in pending):
+        print(f"[{region}] already done, skipping", flush=True)
+    if force:
+        for region in pending:
+            for name in (SUCCESS, "checkpoint.pt"):
+                path = os.path.join(region_out(out_dir, region), name)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    failures = {}
+    if pending:
+        # spawn, not fork: forking a process that has already started torch threads can deadlock
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending)), mp_context=context,
+                                 initializer=_init_worker, initargs=(threads,)) as pool:
+            futures = {
+                pool.submit(train_region, features_root, region, out_dir, **train_kwargs): region
+                for region in pending
+            }
+            for future in as_completed(futures):
+                region = futures[future]
+                try:
+                    summary = future.result()
+                    print(f"[{region}] done: {summary['samples']} samples in {summary['seconds']}s", flush=True)
+                except Exception as e:
+                    failures[region] = e
+                    print(f"[{region}] failed: {e!r}", flush=True)
+
+    merged = merge_scores(out_dir, regions)
+    os.makedirs(out_dir, exist_ok=True)
+    merged.to_csv(os.path.join(out_dir, "std_scores.csv"), index=False)
+    return merged, failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train and score per-region risk models in parallel.")
+    parser.add_argument("--features", default="features", help="feature store root (see ingest.py)")
+    parser.add_argument("--regions", nargs="+", help="default: every region in the feature store")
+    parser.add_argument("--out", default="runs")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPUs / threads)")
+    parser.add_argument("--threads", type=int, help="torch threads per worker")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--seq-len", type=int, default=8)
+    parser.add_argument("--start")
+    parser.add_argument("--end")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--force", action="store_true", help="retrain regions that already finished")
+    args = parser.parse_args(argv)
+
+    merged, failures = train_regions(
+        args.features, args.out, args.regions, args.workers, args.threads, args.force,
+        seq_len=args.seq_len, epochs=args.epochs, batch_size=args.batch_size,
+        start=args.start, end=args.end, seed=args.seed,
+    )
+    print(f"{len(merged)} cells -> {os.path.join(args.out, 'std_scores.csv')}")
+    if failures:
+        raise SystemExit(f"{len(failures)} region(s) failed: {', '.join(sorted(failures))}")
+
+
+if __name__ == "__main__":
+    main()
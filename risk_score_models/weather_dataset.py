@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+import pandas as pd
+import torch
+from numpy.lib.stride_tricks import sliding_window_view
+from torch.utils.data import Dataset
+
+KEY_COLUMNS = ['time', 'lat', 'lon']
+
+
+class WeatherPredictionDataset(Dataset):
+    """Sliding (seq_len -> pred_len) windows over each (lat, lon) cell's weekly features.
+
+    The features are stored once, as one contiguous float32 array sorted by
+    (lat, lon, time). A sample is just a start row, and `__getitem__` returns
+    views into that array, so memory stays at one copy of the series
+    whatever `seq_len` is.
+
+    `index` has one row per sample, in sample order: the cell id, its
+    lat/lon and the time of the first predicted week.
+    """
+
+    def __init__(self, df, seq_len=8, pred_len=1):
+        self.seq_len = seq_len
+        self.pred_len = pred_len
+        df = df.sort_values(['lat', 'lon', 'time']).reset_index(drop=True)
+        self.feature_cols = [col for col in df.columns if col not in KEY_COLUMNS]
+        self.features = np.ascontiguousarray(df[self.feature_cols].to_numpy(dtype=np.float32))
+
+        lat = df['lat'].to_numpy()
+        lon = df['lon'].to_numpy()
+        time = df['time'].to_numpy()
+
+        # Rows are grouped by cell; find where each cell starts and how many windows it holds
+        new_cell = np.r_[True, (lat[1:] != lat[:-1]) | (lon[1:] != lon[:-1])]
+        cell_start = np.flatnonzero(new_cell)
+        cell_len = np.diff(np.r_[cell_start, len(df)])
+        n_windows = np.maximum(cell_len - seq_len - pred_len + 1, 0)
+
+        cell_id = np.repeat(np.arange(len(cell_start)), n_windows)
+        first = np.repeat(np.cumsum(n_windows) - n_windows, n_windows)
+        self.starts = cell_start[cell_id] + (np.arange(len(cell_id)) - first)
+
+        self.cells = pd.DataFrame({'lat': lat[cell_start], 'lon': lon[cell_start]})
+        self.index = pd.DataFrame({
+            'cell': cell_id,
+            'time': time[self.starts + seq_len],
+            'lat': lat[self.starts],
+            'lon': lon[self.starts],
+        })
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, idx):
+        start = self.starts[idx] + self.seq_len
+        X = self.features[start - self.seq_len:start]
+        y = self.features[start:start + self.pred_len]
+        return torch.from_numpy(X), torch.from_numpy(y)
+
+    def windows(self, idx=None):
+        """Input windows as a (n, seq_len, features) array; only the selected samples are copied."""
+        view = sliding_window_view(self.features, self.seq_len, axis=0)
+        starts = self.starts if idx is None else self.starts[idx]
+        return view[starts].transpose(0, 2, 1)
+
+    def targets(self, idx=None):
+        view = sliding_window_view(self.features, self.pred_len, axis=0)
+        starts = self.starts if idx is None else self.starts[idx]
+        return view[starts + self.seq_len].transpose(0, 2, 1)
+
+    def save_index(self, path):
+        if os.path.splitext(path)[1].lower() in ('.parquet', '.pq'):
+            self.index.to_parquet(path, index=False)
+        else:
+            self.index.to_csv(path, index=False)
@@ -1,11 +1,24 @@
+import os
+import tempfile
+
 import streamlit as st
 import pandas as pd
 import numpy as np
-from scipy.spatial import cKDTree
-import requests
-import pydeck as pdk
 import matplotlib.pyplot as plt
 
+from batch_pricing import ZIP_COLUMNS, TableWriter, is_parquet, iter_table, price_stream
+from explanations import DEFAULT_EXPLANATIONS_PATH, Explanations, latest_version
+from instrumentation import Profile, metrics
+from listing_cache import ListingCache
+from listing_store import ListingStore
+from pipeline import PricingPipeline
+from pricing import linear_price, minmax_scale
+from refresher import API_KEY, REFRESHER_MODE, ListingRefresher, make_client
+from risk_grid import GridIndex
+from risk_history import DEFAULT_HISTORY_PATH, RiskHistory
+from risk_map import POINT_THRESHOLD, fit_zoom, risk_map
+from scenarios import ScenarioSweep, linear_scenarios, monte_carlo
+
 # --- API Key Input ---
 st.title("🔐 Risk-Adjusted Housing Prices")
 api_key = st.text_input("Enter your RapidAPI key to begin:", type="password")
@@ -14,177 +27,243 @@ if not api_key:
     st.warning("Please enter your API key to continue.")
     st.stop()
 
-# --- API Function ---
-def get_price_estimates(zip_code="85004", limit=200):
-    url = "https://realty-in-us.p.rapidapi.com/properties/v3/list"
-    headers = {
-        "content-type": "application/json",
-        "X-RapidAPI-Key": api_key,
-        "X-RapidAPI-Host": "realty-in-us.p.rapidapi.com"
-    }
-    payload = {
-        "limit": limit,
-        "offset": 0,
-        "postal_code": zip_code,
-        "status": ["for_sale"],
-        "sort": {"direction": "desc", "field": "list_date"}
-    }
-
-    try:
-        response = requests.post(url, json=payload, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        listings = data.get("data", {}).get("home_search", {}).get("results", [])
-    except Exception as e:
-        st.warning(f"Failed to fetch ZIP {zip_code}: {e}")
-        return pd.DataFrame()
-
-    records = []
-    for home in listings:
-        try:
-            location = home.get("location", {}).get("address", {})
-            coord = location.get("coordinate", {})
-            if not coord.get("lat") or not coord.get("lon"):
-                continue
-            desc = home.get("description", {}) or {}
-            records.append({
-                "address": location.get("line", "N/A"),
-                "city": location.get("city", "N/A"),
-                "zipcode": location.get("postal_code", "N/A"),
-                "base_price": home.get("list_price", None),
-                "nearest_lat": coord.get("lat"),
-                "nearest_lon": coord.get("lon"),
-                "beds": desc.get("beds", None),
-                "baths": desc.get("baths", None),
-                "lot_sqft": desc.get("lot_sqft", None),
-                "type": desc.get("type", None),
-                "url": home.get("href", None)
-            })
-        except:
-            continue
-
-    return pd.DataFrame(records)
-
-# --- Load Data ---
-@st.cache_data
-def load_scores():
-    return pd.read_csv("phoenix_scores.csv")
-
-@st.cache_data
-def load_housing(zips):
-    dfs = [get_price_estimates(zip_code=z) for z in zips]
-    return pd.concat(dfs, ignore_index=True)
-
-PHOENIX_ZIPS = [
-    "85003", "85004", "85006", "85007", "85008", "85009", "85012",
-    "85013", "85014", "85015", "85016", "85017", "85018", "85020",
-    "85021", "85022", "85023", "85024", "85027", "85028", "85029",
-    "85031", "85032", "85033", "85034", "85035", "85037", "85040",
-    "85041", "85042", "85043", "85044", "85045", "85048", "85050",
-    "85051", "85053", "85054", "85083", "85085", "85086", "85087"
-]
-
-df_scores = load_scores()
-df_houses = load_housing(PHOENIX_ZIPS)
-df_houses = df_houses.dropna(subset=['nearest_lat', 'nearest_lon'])
-
-# Match risk scores
-tree = cKDTree(df_scores[['lat', 'lon']].values)
-house_coords = df_houses[['nearest_lat', 'nearest_lon']].values
-_, indices = tree.query(house_coords, k=1)
-df_houses['std_score'] = df_scores.iloc[indices]['std_score'].values
-df_houses = df_houses.dropna(subset=['std_score'])
-
-# Adjust prices
-risk_scaled = (df_houses['std_score'] - df_houses['std_score'].min()) / (
-    df_houses['std_score'].max() - df_houses['std_score'].min()
-)
-df_houses['risk_adjusted_price'] = df_houses['base_price'] * (1 - 0.2 * risk_scaled)
-df_houses['adjustment_pct'] = ((df_houses['risk_adjusted_price'] - df_houses['base_price']) / df_houses['base_price']) * 100
-
-# --- UI ---
-st.subheader("🏡 Property Lookup")
-option = st.radio("Select input method", ["Choose from list", "Manual input"])
-
-if option == "Choose from list":
-    selected = st.selectbox("Select a house", df_houses['address'])
-    row = df_houses[df_houses['address'] == selected].iloc[0]
-    st.write(f"**Base Price:** ${row['base_price']:,}")
-    st.write(f"**Adjusted Price:** ${row['risk_adjusted_price']:.2f}")
-    st.write(f"**Lat/Lon:** ({row['nearest_lat']}, {row['nearest_lon']})")
-    st.write(f"[View Listing](https://www.realtor.com{row['url']})")
-else:
-    lat = st.number_input("Latitude", format="%.6f")
-    lon = st.number_input("Longitude", format="%.6f")
-    price = st.number_input("Base Price (USD)", format="%.2f")
-    _, idx = tree.query([[lat, lon]], k=1)
-    std_score = df_scores.iloc[idx[0]]['std_score']
-    risk_scaled = (std_score - df_scores['std_score'].min()) / (
-        df_scores['std_score'].max() - df_scores['std_score'].min()
-    )
-    adjusted_price = price * (1 - 0.2 * risk_scaled)
-    st.write(f"**Nearest Score:** {std_score:.4f}")
-    st.write(f"**Risk-Adjusted Price:** ${adjusted_price:,.2f}")
-
-# --- Insights ---
-st.divider()
-st.subheader("📊 Data Insights")
-
-if st.checkbox("Top 5 Most Under/Over-Priced Homes"):
-    top_up = df_houses.sort_values("adjustment_pct", ascending=False).head(5)
-    top_down = df_houses.sort_values("adjustment_pct").head(5)
-    st.markdown("#### Most Underpriced")
-    st.dataframe(top_up[['address', 'base_price', 'risk_adjusted_price', 'adjustment_pct']])
-    st.markdown("#### Most Overpriced")
-    st.dataframe(top_down[['address', 'base_price', 'risk_adjusted_price', 'adjustment_pct']])
-
-if st.checkbox("Cumulative Market Impact of Risk"):
-    total_market_value = df_houses['base_price'].sum()
-    total_adjusted_value = df_houses['risk_adjusted_price'].sum()
-    delta = total_adjusted_value - total_market_value
-    st.metric("Total Market Value", f"${total_market_value:,.0f}")
-    st.metric("Total Adjusted Value", f"${total_adjusted_value:,.0f}",
-              delta=f"${abs(delta):,.0f}", delta_color="inverse" if delta < 0 else "normal")
-
-if st.checkbox("Adjusted Price per Square Foot"):
-    df_houses['adjusted_ppsqft'] = df_houses['risk_adjusted_price'] / df_houses['lot_sqft']
-    top_ppsqft = df_houses[['address', 'type', 'adjusted_ppsqft']].dropna().sort_values('adjusted_ppsqft', ascending=False)
-    st.dataframe(top_ppsqft.head(10))
-
-if st.checkbox("Show Map of All Homes by Risk"):
-    df_houses['lat'] = df_houses['nearest_lat']
-    df_houses['lon'] = df_houses['nearest_lon']
-    layer = pdk.Layer(
-        'ScatterplotLayer',
-        data=df_houses,
-        get_position='[lon, lat]',
-        get_color='[255 * std_score, 50, 150]',
-        get_radius=100,
-        pickable=True
-    )
-    st.pydeck_chart(pdk.Deck(
-        initial_view_state=pdk.ViewState(
-            latitude=df_houses['lat'].mean(),
-            longitude=df_houses['lon'].mean(),
-            zoom=12
-        ),
-        layers=[layer],
-        tooltip={"text": "{address}\\nPrice: ${base_price}\\nRisk: {std_score}"}
-    ))
-
-if st.checkbox("Simulate Risk Sensitivity"):
-    penalty_slider = st.slider("Risk Penalty Weight", 0.0, 1.0, 0.4)
-    df_houses['simulated_price'] = df_houses['base_price'] * (1 - penalty_slider * risk_scaled)
-    st.markdown("#### Simulated Adjusted Price (with Risk Penalty Weight)")
-    chart_data = pd.DataFrame({
-        'Original Price': df_houses['base_price'],
-        'Simulated Price': df_houses['simulated_price']
-    })
-    fig, ax = plt.subplots(figsize=(8, 4))
-    ax.plot(chart_data['Original Price'].values, label='Original Price')
-    ax.plot(chart_data['Simulated Price'].values, label='Simulated Price', linestyle='--')
-    ax.set_title("Price Adjustment under Varying Risk Penalty")
-    ax.set_ylabel("Price ($)")
-    ax.set_xlabel("Property Index")
-    ax.legend()
-    st.pyplot(fig)
+# Per-session run metrics: `metrics` itself is shared with other sessions and the refresher
+run = metrics.start_run()
+run_profile = Profile("app_run").start()
+
+def end_app_run():
+    run_profile.stop()
+    return metrics.end_run(run)
+
+# st.stop(), a rerun or an error can end the script anywhere: the run is always closed
+try:
+    # --- Load Data ---
+    # Built once per process: the score table and its lookup index stay warm across reruns
+    @st.cache_resource
+    def load_pipeline():
+        return PricingPipeline.from_path()
+
+    # Listings are fetched by the background refresher; the app only reads the cache.
+    # One refresher per process (one cache, one quota), on the server's own RAPIDAPI_KEY.
+    # `version` (the latest fetch time) changes whenever the refresher stores new data.
+    @st.cache_resource
+    def start_refresher(zips):
+        return ListingRefresher(make_client(API_KEY), ListingCache(), zips).start()
+
+    @st.cache_data(max_entries=4)
+    def load_housing(zips, version):
+        with metrics.stage("cache_load"):
+            return ListingCache().load(list(zips))
+
+    @st.cache_resource
+    def load_history():
+        return RiskHistory(DEFAULT_HISTORY_PATH) if os.path.isdir(DEFAULT_HISTORY_PATH) else None
+
+    # Keyed by model version, so a newly written set of attributions replaces the old one
+    @st.cache_resource(max_entries=2)
+    def load_explanations(version):
+        return Explanations(DEFAULT_EXPLANATIONS_PATH, version) if version else None
+
+    # One sweep over all penalty weights per listing set: the slider only picks a column
+    @st.cache_resource(max_entries=4)
+    def penalty_sweep(price, scores):
+        return ScenarioSweep(price, scores, linear_scenarios())
+
+    @st.cache_data(max_entries=4)
+    def score_uncertainty(price, scores, score_sd):
+        return monte_carlo(price, scores, linear_scenarios(), score_sd)
+
+    # Matched, priced and indexed once per listing set and lookup method
+    @st.cache_resource(max_entries=4)
+    def load_store(_pipeline, zips, lookup_method, version):
+        df = _pipeline.match(load_housing(zips, version), method=lookup_method)
+        return ListingStore(_pipeline.price(df, relative=True))
+
+    # Refresh priority follows demand: only ZIPs a user actually looks at are recorded
+    def record_zips(chunks, seen):
+        """Passes upload chunks through, collecting their ZIPs into `seen`."""
+        for df, fraction in chunks:
+            col = next((c for c in ZIP_COLUMNS if c in df.columns), None)
+            if col is not None:
+                seen.update(df[col].dropna().astype(str).str[:5])
+            yield df, fraction
+
+    pipeline = load_pipeline()
+
+    # Match risk scores
+    lookup_method = "nearest"
+    if isinstance(pipeline.index, GridIndex) and st.sidebar.checkbox("Interpolate risk between grid cells"):
+        lookup_method = "bilinear"
+    zips = tuple(pipeline.zips())
+    listing_cache = ListingCache()
+    if REFRESHER_MODE == "thread":
+        if API_KEY:
+            start_refresher(zips)
+        else:
+            st.sidebar.warning("RAPIDAPI_KEY is not set on the server: showing cached listings only.")
+    with metrics.stage("load_housing"):
+        store = load_store(pipeline, zips, lookup_method, listing_cache.version(zips))
+
+    df_houses = store.df
+    if df_houses.empty:
+        st.info("Listings are being fetched in the background. Rerun the app in a minute.")
+        st.stop()
+
+    # --- UI ---
+    st.subheader("🏡 Property Lookup")
+    option = st.radio("Select input method", ["Choose from list", "Manual input", "Upload file"])
+
+    if option == "Choose from list":
+        selected = st.selectbox("Select a house", df_houses['address'])
+        row = store.get(address=selected)
+        if st.session_state.get('looked_up') != selected:
+            listing_cache.record_queries([str(row['zipcode'])])
+            st.session_state['looked_up'] = selected
+        st.write(f"**Base Price:** ${row['base_price']:,}")
+        st.write(f"**Adjusted Price:** ${row['risk_adjusted_price']:.2f}")
+        st.write(f"**Lat/Lon:** ({row['nearest_lat']}, {row['nearest_lon']})")
+        st.write(f"[View Listing](https://www.realtor.com{row['url']})")
+
+        history = load_history()
+        if history is not None and st.checkbox("Show risk history for this home"):
+            first, last = pd.Timestamp(history.weeks[0]).date(), pd.Timestamp(history.weeks[-1]).date()
+            window = st.date_input("Date range", (first, last), min_value=first, max_value=last)
+            start, end = (window[0], window[-1]) if len(window) else (first, last)
+            with metrics.stage("history_query"):
+                trajectory = history.trajectory(row['nearest_lat'], row['nearest_lon'], start, end)
+                cell = history.cell_ids(row['nearest_lat'], row['nearest_lon'])
+                window_std = float(history.window_std(start, end, [cell])[0])
+            st.line_chart(trajectory.set_index('time'))
+            st.write(f"**std_score over this window:** {window_std:.4f}")
+
+        explanations = load_explanations(latest_version(DEFAULT_EXPLANATIONS_PATH))
+        # Only attributions of the forecast error (the per-week risk score) say anything about risk
+        explains_risk = explanations is not None and explanations.meta.get("output") == "error"
+        label = "Why is this home's risk high?" if explains_risk else "What drives the weather forecast here?"
+        if explanations is not None and st.checkbox(label):
+            with metrics.stage("explanation_lookup"):
+                cell, features = explanations.explain(row['nearest_lat'], row['nearest_lon'])
+            if explains_risk:
+                st.caption(f"Model {explanations.version}: weekly risk score (forecast error) {cell['output']:.4f} "
+                           f"for the week of {cell['time']}, vs. {cell['base_value']:.4f} under typical weather. "
+                           "Positive bars raised it.")
+            else:
+                st.caption(f"Model {explanations.version}: contributions to the model's forecast "
+                           f"({explanations.meta.get('output')}) for the week of {cell['time']}; "
+                           "these describe the forecast, not the risk score.")
+            st.bar_chart(features.set_index('feature'))
+    elif option == "Manual input":
+        lat = st.number_input("Latitude", format="%.6f")
+        lon = st.number_input("Longitude", format="%.6f")
+        price = st.number_input("Base Price (USD)", format="%.2f")
+        std_score = float(pipeline.index.lookup(lat, lon, method=lookup_method))
+        point_scaled = minmax_scale(std_score, *pipeline.score_range)
+        adjusted_price = linear_price(price, point_scaled)
+        st.write(f"**Nearest Score:** {std_score:.4f}")
+        st.write(f"**Risk-Adjusted Price:** ${adjusted_price:,.2f}")
+
+    else:
+        uploaded = st.file_uploader("CSV or Parquet with lat/lon (or nearest_lat/nearest_lon) and price columns",
+                                    type=["csv", "parquet", "pq"])
+        if uploaded is not None and st.button("Price file"):
+            out_name = os.path.splitext(uploaded.name)[0] + "_priced" + os.path.splitext(uploaded.name)[1]
+            # One priced file per session at a time: each click replaces the last one
+            if 'priced_path' not in st.session_state:
+                fd, st.session_state['priced_path'] = tempfile.mkstemp(prefix="priced_")
+                os.close(fd)
+            out_path = st.session_state['priced_path']
+            st.session_state.pop('priced_upload', None)
+            if os.path.exists(out_path):
+                os.remove(out_path)
+            progress = st.progress(0.0, text="Pricing...")
+            uploaded_zips = set()
+            try:
+                with TableWriter(out_path, parquet=is_parquet(uploaded.name)) as writer:
+                    rows = price_stream(
+                        pipeline, record_zips(iter_table(uploaded, name=uploaded.name), uploaded_zips), writer,
+                        on_progress=lambda fraction, rows: progress.progress(fraction, text=f"Priced {rows:,} rows")
+                    )
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                st.session_state['priced_upload'] = (out_path, out_name, rows)
+                listing_cache.record_queries(sorted(uploaded_zips.intersection(zips)))
+        if 'priced_upload' in st.session_state:
+            out_path, out_name, rows = st.session_state['priced_upload']
+            # An upload with no priceable rows may leave no output file at all
+            if rows == 0:
+                st.info("No rows could be priced: the file is empty or has no homes inside score coverage.")
+            else:
+                st.write(f"**Priced rows:** {rows:,}")
+                with open(out_path, "rb") as f:
+                    st.download_button("Download priced file", f, file_name=out_name)
+
+    # --- Insights ---
+    st.divider()
+    st.subheader("📊 Data Insights")
+
+    if st.checkbox("Top 5 Most Under/Over-Priced Homes"):
+        top_up = store.top("adjustment_pct", 5)
+        top_down = store.top("adjustment_pct", 5, ascending=True)
+        st.markdown("#### Most Underpriced")
+        st.dataframe(top_up[['address', 'base_price', 'risk_adjusted_price', 'adjustment_pct']])
+        st.markdown("#### Most Overpriced")
+        st.dataframe(top_down[['address', 'base_price', 'risk_adjusted_price', 'adjustment_pct']])
+
+    if st.checkbox("Cumulative Market Impact of Risk"):
+        total_market_value = df_houses['base_price'].sum()
+        total_adjusted_value = df_houses['risk_adjusted_price'].sum()
+        delta = total_adjusted_value - total_market_value
+        st.metric("Total Market Value", f"${total_market_value:,.0f}")
+        st.metric("Total Adjusted Value", f"${total_adjusted_value:,.0f}",
+                  delta=f"${abs(delta):,.0f}", delta_color="inverse" if delta < 0 else "normal")
+
+    if st.checkbox("Adjusted Price per Square Foot"):
+        st.dataframe(store.top("adjusted_ppsqft", 10)[['address', 'type', 'adjusted_ppsqft']])
+
+    if st.checkbox("Show Map of All Homes by Risk"):
+        zoom = st.slider("Map zoom", 3, 15, fit_zoom(df_houses['nearest_lat'], df_houses['nearest_lon']),
+                         help=f"Above {POINT_THRESHOLD:,} homes the map shows binned averages sized to this zoom")
+        with metrics.stage("render_map", rows=len(df_houses)):
+            st.pydeck_chart(risk_map(df_houses, zoom))
+
+    if st.checkbox("Simulate Risk Sensitivity"):
+        sweep = penalty_sweep(df_houses['base_price'].to_numpy(dtype=float, na_value=np.nan),
+                              df_houses['std_score'].to_numpy(dtype=float, na_value=np.nan))
+        penalty_slider = st.slider("Risk Penalty Weight", 0.0, 1.0, 0.4)
+        st.markdown("#### Simulated Adjusted Price (with Risk Penalty Weight)")
+        chart_data = pd.DataFrame({
+            'Original Price': df_houses['base_price'],
+            'Simulated Price': sweep.prices(weight=penalty_slider)
+        })
+        with metrics.stage("render_chart", rows=len(df_houses)):
+            fig, ax = plt.subplots(figsize=(8, 4))
+            ax.plot(chart_data['Original Price'].values, label='Original Price')
+            ax.plot(chart_data['Simulated Price'].values, label='Simulated Price', linestyle='--')
+            ax.set_title("Price Adjustment under Varying Risk Penalty")
+            ax.set_ylabel("Price ($)")
+            ax.set_xlabel("Property Index")
+            ax.legend()
+            st.pyplot(fig)
+
+        st.markdown("#### Portfolio Value across Penalty Weights")
+        score_sd = st.slider("Score uncertainty (std dev of std_score)", 0.0, 1.0, 0.0, 0.05)
+        bands = sweep.summary.set_index('weight')[['market_value', 'adjusted_value']]
+        if score_sd > 0:
+            draws = score_uncertainty(df_houses['base_price'].to_numpy(dtype=float, na_value=np.nan),
+                                      df_houses['std_score'].to_numpy(dtype=float, na_value=np.nan), score_sd)
+            bands = bands.join(draws.set_index('weight'))
+        st.line_chart(bands)
+        st.dataframe(sweep.summary.iloc[sweep.column(weight=penalty_slider)].to_frame("selected weight"))
+
+    # --- Debug ---
+    run_summary = end_app_run()
+    with st.sidebar.expander("🛠 Debug: last run"):
+        st.markdown("**Stage timings (ms)**")
+        st.dataframe(pd.DataFrame(
+            {"ms": {stage: seconds * 1e3 for stage, seconds in run_summary["stages"].items()}}
+        ).sort_values("ms", ascending=False))
+        st.markdown("**Counters (this run)**")
+        st.json(run_summary["counters"])
+finally:
+    end_app_run()
@@ -0,0 +1,159 @@
+"""Chunked risk-adjusted pricing for files of any size.
+
+Rows are read, matched, priced and written `chunk_rows` at a time, so
+memory follows the chunk size rather than the file size. Used by the
+app's upload mode and by price_cli.py.
+
+    with TableWriter("priced.parquet") as writer:
+        price_stream(pipeline, iter_table("portfolio.csv"), writer)
+
+Every chunk is scaled against the pipeline's full score range (not the
+chunk's own), so results do not depend on where chunk boundaries fall.
+"""
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from instrumentation import metrics
+
+CHUNK_ROWS = 50_000
+
+LAT_COLUMNS = ["nearest_lat", "lat", "latitude"]
+LON_COLUMNS = ["nearest_lon", "lon", "longitude"]
+PRICE_COLUMNS = ["base_price", "price"]
+ZIP_COLUMNS = ["zipcode", "zip", "postal_code"]
+NUMERIC_COLUMNS = LAT_COLUMNS + LON_COLUMNS + PRICE_COLUMNS
+
+
+def is_parquet(name):
+    return os.path.splitext(name)[1].lower() in (".parquet", ".pq")
+
+
+def pick_column(columns, requested, candidates):
+    if requested:
+        return requested
+    for col in candidates:
+        if col in columns:
+            return col
+    raise ValueError(f"None of the columns {candidates} found; pass it explicitly")
+
+
+def csv_dtypes(sample, numeric=()):
+    """CSV dtypes pinned from the first chunk, so every chunk parses the same way.
+
+    Text columns, and columns that are empty throughout the sample, are read
+    as strings; otherwise a column left empty in the first chunk parses as
+    float there and as text in a later one. `numeric` columns (coordinates,
+    prices) are always read as floats.
+    """
+    dtypes = {}
+    for col in sample.columns:
+        if col in numeric:
+            dtypes[col] = "float64"
+        elif sample[col].dtype == object or sample[col].isna().all():
+            dtypes[col] = "string"
+    return dtypes
+
+
+def iter_table(source, chunk_rows=CHUNK_ROWS, name=None, numeric=None):
+    """Yields (chunk DataFrame, fraction of the input read so far).
+
+    `source` is a path or a binary file object; `name` gives the file type
+    when `source` has no usable path (e.g. an uploaded file). `numeric`
+    lists the CSV columns to parse as numbers (default: the usual
+    coordinate and price names).
+    """
+    name = name or (source if isinstance(source, str) else getattr(source, "name", ""))
+    if is_parquet(name):
+        parquet = pq.ParquetFile(source)
+        total = max(parquet.metadata.num_rows, 1)
+        done = 0
+        for batch in parquet.iter_batches(batch_size=chunk_rows):
+            done += batch.num_rows
+            yield batch.to_pandas(), done / total
+        return
+
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            yield from iter_table(f, chunk_rows, name, numeric)
+        return
+    size = source.seek(0, os.SEEK_END)
+    source.seek(0)
+    numeric = set(NUMERIC_COLUMNS if numeric is None else numeric)
+    dtype = csv_dtypes(pd.read_csv(source, nrows=chunk_rows), numeric)
+    source.seek(0)
+    with pd.read_csv(source, chunksize=chunk_rows, dtype=dtype) as reader:
+        for chunk in reader:
+            # The parser reads ahead in blocks, so the position is approximate
+            yield chunk, min(source.tell() / size, 1.0) if size else 1.0
+
+
+class TableWriter:
+    """Appends DataFrame chunks to one CSV or Parquet file.
+
+    If a write fails inside the `with` block, the partial file is removed.
+    """
+
+    def __init__(self, path, parquet=None):
+        self.path = path
+        self.parquet = is_parquet(path) if parquet is None else parquet
+        self.rows = 0
+        self._writer = None
+        self._schema = None
+        self._started = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        if exc_type is not None and self._started and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def write(self, df):
+        if self.parquet:
+            # Later chunks are cast to the first chunk's schema; a column with no values
+            # yet (null type) is written as string so later chunks can fill it
+            table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+            if self._writer is None:
+                self._schema = pa.schema([
+                    field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                    for field in table.schema
+                ], metadata=table.schema.metadata)
+                table = table.cast(self._schema)
+                self._started = True
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            self._writer.write_table(table)
+        else:
+            header = not self._started
+            self._started = True
+            df.to_csv(self.path, mode="w" if header else "a", header=header, index=False)
+        self.rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def price_stream(pipeline, chunks, writer, lat_col=None, lon_col=None, price_col=None,
+                 scores_only=False, on_progress=None):
+    """Matches and prices each chunk, writes it, and returns the rows written.
+
+    Rows without coordinates or outside score coverage are dropped, as in
+    `PricingPipeline.match`. `on_progress(fraction, rows_written)` is called
+    after every chunk.
+    """
+    for df, fraction in chunks:
+        lat = pick_column(df.columns, lat_col, LAT_COLUMNS)
+        lon = pick_column(df.columns, lon_col, LON_COLUMNS)
+        df = pipeline.match(df, lat, lon)
+        if not scores_only:
+            df = pipeline.price(df, pick_column(df.columns, price_col, PRICE_COLUMNS))
+        with metrics.stage("write", rows=len(df)):
+            writer.write(df)
+        if on_progress is not None:
+            on_progress(fraction, writer.rows)
+    return writer.rows
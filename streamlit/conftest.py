@@ -0,0 +1,14 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline import PricingPipeline
+
+
+@pytest.fixture(scope="module")
+def pipeline():
+    """Scores on a 10 x 10 lattice over 33.0-33.9 N, 112.5-111.6 W."""
+    lat, lon = np.meshgrid(np.arange(33.0, 34.0, 0.1), np.arange(-112.5, -111.5, 0.1), indexing="ij")
+    scores = pd.DataFrame({"lat": lat.ravel(), "lon": lon.ravel(),
+                           "std_score": np.linspace(0.1, 0.9, lat.size)})
+    return PricingPipeline.from_scores(scores)
@@ -0,0 +1,55 @@
+"""Precomputed per-cell SHAP attributions (see risk_score_models/explain.py).
+
+Attributions are looked up, never computed, in the app: a property maps
+to its nearest grid cell through the same grid/KD-tree index as the score
+lookup, and its row of attributions is already on disk.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from risk_grid import GridIndex, KDTreeIndex
+
+DEFAULT_EXPLANATIONS_PATH = os.environ.get(
+    "EXPLANATIONS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "explanations")
+)
+
+
+def latest_version(root):
+    path = os.path.join(root, "latest")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return f.read().strip() or None
+
+
+class Explanations:
+    """One model version's attributions; `version` defaults to the latest written."""
+
+    def __init__(self, root=DEFAULT_EXPLANATIONS_PATH, version=None):
+        self.version = version or latest_version(root)
+        if self.version is None:
+            raise FileNotFoundError(f"No explanations under {root}")
+        path = os.path.join(root, self.version)
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.feature_names = self.meta["feature_names"]
+        self.cells = pd.read_csv(os.path.join(path, "cells.csv"))
+        self.values = np.load(os.path.join(path, "attributions.npy"), mmap_mode="r")
+
+        lats, lons = self.cells["lat"].to_numpy(), self.cells["lon"].to_numpy()
+        ids = np.arange(len(self.cells))
+        self.index = GridIndex.from_points(lats, lons, ids) or KDTreeIndex(lats, lons, ids)
+
+    def explain(self, lat, lon, top=10):
+        """(cell row, top-`top` features by |attribution|) for the cell nearest (lat, lon)."""
+        row = int(np.asarray(self.index.nearest(lat, lon)))
+        values = np.asarray(self.values[row])
+        order = np.argsort(-np.abs(values))[:top]
+        features = pd.DataFrame({
+            "feature": [self.feature_names[i] for i in order],
+            "attribution": values[order],
+        })
+        return self.cells.iloc[row], features
@@ -0,0 +1,202 @@
+"""Per-stage timers, counters and optional profiling for the pricing pipeline.
+
+    with metrics.stage("match", rows=len(df)):
+        ...
+    metrics.incr("requests")
+
+Stage timings and counters are logged as one JSON object per line on the
+"pipeline" logger (set PIPELINE_LOG_LEVEL=INFO to see them). They are
+also kept in memory for the app's debug panel and exposed in Prometheus
+text format: `metrics.to_prometheus()`, the HTTP service's /metrics, or
+the file named by PIPELINE_METRICS_FILE, rewritten after every run.
+
+`metrics` is shared by the whole process (every Streamlit session, the
+background refresher). Per-run figures come from the `RunMetrics` that
+`start_run()` returns: only stages and counters recorded in the same
+context as that run are added to it. Worker threads start with an empty
+context, so pools that should count towards the caller's run submit
+through `contextvars.copy_context().run` (as RealtorClient does).
+
+PIPELINE_PROFILE=cprofile|pyinstrument profiles each `Profile` block and
+writes the result to PIPELINE_PROFILE_DIR (default: profiles/).
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("pipeline")
+if os.environ.get("PIPELINE_LOG_LEVEL"):
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(os.environ["PIPELINE_LOG_LEVEL"].upper())
+
+METRICS_FILE = os.environ.get("PIPELINE_METRICS_FILE")
+PROFILE_MODE = os.environ.get("PIPELINE_PROFILE", "").lower()
+PROFILE_DIR = os.environ.get("PIPELINE_PROFILE_DIR", "profiles")
+
+
+def log_event(event, **fields):
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({"event": event, "ts": round(time.time(), 3), **fields}, default=str))
+
+
+class RunMetrics:
+    """Stage seconds and counters of one run (an app rerun, a CLI call)."""
+
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self.ended = False
+
+    def summary(self):
+        return {"stages": dict(self.stages), "counters": dict(self.counters)}
+
+
+class Metrics:
+    """Thread-safe stage timers and counters, cumulative and per run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stage_seconds = {}
+        self.stage_calls = {}
+        self.counters = {}
+        self.last_run = {}
+        self._run = contextvars.ContextVar("metrics_run", default=None)
+
+    @contextmanager
+    def stage(self, name, **fields):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            run = self._run.get()
+            with self._lock:
+                self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+                self.stage_calls[name] = self.stage_calls.get(name, 0) + 1
+                if run is not None:
+                    run.stages[name] = run.stages.get(name, 0.0) + seconds
+            log_event("stage", stage=name, seconds=round(seconds, 6), **fields)
+
+    def incr(self, name, value=1):
+        run = self._run.get()
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+            if run is not None:
+                run.counters[name] = run.counters.get(name, 0) + value
+
+    def start_run(self):
+        """Starts collecting a run in the current context and returns it."""
+        run = RunMetrics()
+        self._run.set(run)
+        return run
+
+    def end_run(self, run=None):
+        """Stops collecting `run` (default: the current context's) and returns its summary.
+
+        Ending a run again only returns its summary, so it is safe in a `finally`.
+        """
+        run = run or self._run.get() or RunMetrics()
+        if self._run.get() is run:
+            self._run.set(None)
+        summary = self.run_summary(run)
+        if run.ended:
+            return summary
+        run.ended = True
+        with self._lock:
+            self.last_run = summary["stages"]
+        log_event("run", **summary)
+        if METRICS_FILE:
+            self.write_prometheus(METRICS_FILE)
+        return summary
+
+    def run_summary(self, run=None):
+        """Stage seconds and counters of `run` (default: the current context's)."""
+        run = run or self._run.get() or RunMetrics()
+        with self._lock:
+            return run.summary()
+
+    def to_prometheus(self, prefix="pipeline"):
+        with self._lock:
+            lines = [
+                f"# HELP {prefix}_stage_seconds_total Time spent per pipeline stage.",
+                f"# TYPE {prefix}_stage_seconds_total counter",
+            ]
+            lines += [f'{prefix}_stage_seconds_total{{stage="{k}"}} {v:.6f}'
+                      for k, v in sorted(self.stage_seconds.items())]
+            lines += [f"# TYPE {prefix}_stage_calls_total counter"]
+            lines += [f'{prefix}_stage_calls_total{{stage="{k}"}} {v}'
+                      for k, v in sorted(self.stage_calls.items())]
+            lines += [f"# TYPE {prefix}_last_run_stage_seconds gauge"]
+            lines += [f'{prefix}_last_run_stage_seconds{{stage="{k}"}} {v:.6f}'
+                      for k, v in sorted(self.last_run.items())]
+            for name, value in sorted(self.counters.items()):
+                lines += [f"# TYPE {prefix}_{name}_total counter", f"{prefix}_{name}_total {value}"]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+
+class Profile:
+    """cProfile/pyinstrument around a block, switched on by PIPELINE_PROFILE."""
+
+    def __init__(self, name, mode=PROFILE_MODE, out_dir=PROFILE_DIR):
+        self.name = name
+        self.mode = mode
+        self.out_dir = out_dir
+        self._profiler = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        if self.mode == "cprofile":
+            import cProfile
+
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError as e:
+                # 3.12+: only one profiler per process (another session's run is still profiled)
+                log_event("profile_skipped", name=self.name, error=str(e))
+                return self
+            self._profiler = profiler
+        elif self.mode == "pyinstrument":
+            from pyinstrument import Profiler
+
+            self._profiler = Profiler()
+            self._profiler.start()
+        return self
+
+    def stop(self):
+        if self._profiler is None:
+            return None
+        os.makedirs(self.out_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        if self.mode == "cprofile":
+            self._profiler.disable()
+            path = os.path.join(self.out_dir, f"{self.name}-{stamp}.prof")
+            self._profiler.dump_stats(path)
+        else:
+            self._profiler.stop()
+            path = os.path.join(self.out_dir, f"{self.name}-{stamp}.html")
+            with open(path, "w") as f:
+                f.write(self._profiler.output_html())
+        self._profiler = None
+        log_event("profile", name=self.name, path=path)
+        return path
+
+
+metrics = Metrics()
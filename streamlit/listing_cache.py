@@ -0,0 +1,231 @@
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from instrumentation import metrics
+from realtor import LISTING_COLUMNS, parse_listings
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "LISTING_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "listings.sqlite")
+)
+DEFAULT_TTL = float(os.environ.get("LISTING_CACHE_TTL", 6 * 3600))
+DEFAULT_FULL_REFRESH_TTL = float(os.environ.get("LISTING_CACHE_FULL_REFRESH_TTL", 7 * 24 * 3600))
+
+
+class ListingCache:
+    """SQLite-backed listing cache, stored and refreshed per ZIP.
+
+    A ZIP older than `ttl` is refreshed incrementally (only listings newer
+    than the ones already cached are fetched). Once it is older than
+    `full_refresh_ttl` it is refetched in full so delisted homes drop out.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL,
+                 full_refresh_ttl=DEFAULT_FULL_REFRESH_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.full_refresh_ttl = full_refresh_ttl
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            columns = ", ".join(LISTING_COLUMNS)
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS listings (query_zip TEXT, position REAL, {columns}, "
+                "PRIMARY KEY (query_zip, property_id))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS zip_state "
+                "(query_zip TEXT PRIMARY KEY, fetched_at REAL, full_fetched_at REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS zip_demand "
+                "(query_zip TEXT PRIMARY KEY, queries INTEGER, last_queried REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS api_usage (month TEXT PRIMARY KEY, requests INTEGER)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        # A fresh connection per call keeps the cache usable from any Streamlit thread
+        conn = sqlite3.connect(self.path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def state(self, zips):
+        placeholders = ", ".join("?" * len(zips))
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT query_zip, fetched_at, full_fetched_at FROM zip_state "
+                f"WHERE query_zip IN ({placeholders})", list(zips)
+            ).fetchall()
+        return {z: (fetched, full) for z, fetched, full in rows}
+
+    def plan(self, zips, now=None):
+        """Splits `zips` into (fresh, incremental, full) refresh groups."""
+        now = time.time() if now is None else now
+        state = self.state(zips)
+        fresh, incremental, full = [], [], []
+        for z in zips:
+            if z not in state:
+                full.append(z)
+                continue
+            fetched_at, full_fetched_at = state[z]
+            if now - full_fetched_at >= self.full_refresh_ttl:
+                full.append(z)
+            elif now - fetched_at >= self.ttl:
+                incremental.append(z)
+            else:
+                fresh.append(z)
+        return fresh, incremental, full
+
+    def version(self, zips):
+        """Latest fetch time over `zips`; changes whenever any of them is refreshed."""
+        return max((fetched for fetched, _ in self.state(zips).values()), default=None)
+
+    def record_queries(self, zips, now=None):
+        now = time.time() if now is None else now
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO zip_demand VALUES (?, 1, ?) ON CONFLICT (query_zip) "
+                "DO UPDATE SET queries = queries + 1, last_queried = excluded.last_queried",
+                [(z, now) for z in zips]
+            )
+
+    def demand(self, zips):
+        placeholders = ", ".join("?" * len(zips))
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT query_zip, queries FROM zip_demand WHERE query_zip IN ({placeholders})",
+                list(zips)
+            ).fetchall()
+        return dict(rows)
+
+    def record_requests(self, n, now=None):
+        self.reserve_requests(n, now=now)
+
+    def reserve_requests(self, n=1, limit=None, now=None):
+        """Counts `n` requests this month unless that would pass `limit`; returns whether it did.
+
+        The check and the increment are one statement, so concurrent
+        refreshers (threads or processes) can't overshoot the limit together.
+        """
+        month = time.strftime("%Y-%m", time.gmtime(time.time() if now is None else now))
+        with self._connect() as conn:
+            conn.execute("INSERT OR IGNORE INTO api_usage VALUES (?, 0)", (month,))
+            reserved = conn.execute(
+                "UPDATE api_usage SET requests = requests + ? "
+                "WHERE month = ? AND (? IS NULL OR requests + ? <= ?)", (n, month, limit, n, limit)
+            ).rowcount
+        return reserved == 1
+
+    def requests_this_month(self, now=None):
+        month = time.strftime("%Y-%m", time.gmtime(time.time() if now is None else now))
+        with self._connect() as conn:
+            row = conn.execute("SELECT requests FROM api_usage WHERE month = ?", (month,)).fetchone()
+        return row[0] if row else 0
+
+    def known_ids(self, zips):
+        placeholders = ", ".join("?" * len(zips))
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT query_zip, property_id FROM listings WHERE query_zip IN ({placeholders})",
+                list(zips)
+            ).fetchall()
+        known = {z: set() for z in zips}
+        for z, property_id in rows:
+            known[z].add(property_id)
+        return known
+
+    def store(self, zip_code, records, replace=False, now=None):
+        now = time.time() if now is None else now
+        columns = ["query_zip", "position"] + LISTING_COLUMNS
+        placeholders = ", ".join("?" * len(columns))
+        with self._connect() as conn:
+            if replace:
+                conn.execute("DELETE FROM listings WHERE query_zip = ?", (zip_code,))
+                base_position = 0
+            else:
+                # New listings are newer than everything cached, so they sort ahead of it
+                (low,) = conn.execute(
+                    "SELECT MIN(position) FROM listings WHERE query_zip = ?", (zip_code,)
+                ).fetchone()
+                base_position = (low or 0) - len(records)
+            conn.executemany(
+                f"INSERT OR REPLACE INTO listings ({', '.join(columns)}) VALUES ({placeholders})",
+                [[zip_code, base_position + i] + [r[c] for c in LISTING_COLUMNS]
+                 for i, r in enumerate(records)]
+            )
+            if replace:
+                conn.execute(
+                    "INSERT OR REPLACE INTO zip_state VALUES (?, ?, ?)", (zip_code, now, now)
+                )
+            else:
+                conn.execute(
+                    "UPDATE zip_state SET fetched_at = ? WHERE query_zip = ?", (now, zip_code)
+                )
+
+    def load(self, zips):
+        placeholders = ", ".join("?" * len(zips))
+        order = {z: i for i, z in enumerate(zips)}
+        with self._connect() as conn:
+            df = pd.read_sql_query(
+                f"SELECT query_zip, {', '.join(LISTING_COLUMNS)} FROM listings "
+                f"WHERE query_zip IN ({placeholders}) ORDER BY query_zip, position",
+                conn, params=list(zips)
+            )
+        df = df.iloc[df["query_zip"].map(order).argsort(kind="stable")]
+        return df.drop(columns="query_zip").reset_index(drop=True)
+
+
+def refresh_listings(client, cache, zips, on_error=None):
+    """Fetches the stale ZIPs among `zips` into `cache`; returns the ZIPs that failed.
+
+    A ZIP that fails to refresh keeps serving its cached listings.
+    """
+    zips = list(dict.fromkeys(zips))
+    fresh, incremental, full = cache.plan(zips)
+    metrics.incr("cache_hits", len(fresh))
+    metrics.incr("cache_misses", len(incremental) + len(full))
+    failed = set()
+    sent = client.requests_sent
+
+    def record_error(zip_code, error):
+        failed.add(zip_code)
+        if on_error is not None:
+            on_error(zip_code, error)
+
+    if full:
+        pages = client.fetch_pages(full, on_error=record_error)
+        for z in full:
+            if z not in failed:
+                cache.store(z, parse_listings(pages[z]), replace=True)
+
+    if incremental:
+        pages = client.fetch_pages(
+            incremental, on_error=record_error, known_ids=cache.known_ids(incremental)
+        )
+        for z in incremental:
+            if z not in failed:
+                cache.store(z, parse_listings(pages[z]))
+
+    # A client with a quota has already counted each request before sending it
+    if client.quota is None and client.requests_sent > sent:
+        cache.record_requests(client.requests_sent - sent)
+    return failed
+
+
+def load_listings(client, cache, zips, on_error=None):
+    """Returns listings for `zips`, only hitting the API for stale ZIPs."""
+    zips = list(dict.fromkeys(zips))
+    refresh_listings(client, cache, zips, on_error=on_error)
+    with metrics.stage("cache_load"):
+        df = cache.load(zips)
+    metrics.incr("rows_loaded", len(df))
+    return df
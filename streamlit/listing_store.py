@@ -0,0 +1,108 @@
+"""Priced listings held in compact columns with hash indexes and top-N rankings.
+
+    store = ListingStore(df_priced)
+    store.get(address="123 Main St")       # O(1) row lookup
+    store.in_zip("85004")                  # rows for one ZIP
+    store.top("adjustment_pct", 5)         # most underpriced, no full sort
+
+Rankings for RANKED_COLUMNS are found with argpartition (O(n)) when the
+store is built or a column is replaced with `set_column`, then read from
+memory.
+"""
+import numpy as np
+import pandas as pd
+
+CATEGORY_COLUMNS = ["city", "zipcode", "type"]
+# Display-only values where float32's ~7 significant digits are plenty;
+# prices and coordinates stay float64
+FLOAT32_COLUMNS = ["beds", "baths", "lot_sqft", "std_score", "adjustment_pct", "adjusted_ppsqft"]
+RANKED_COLUMNS = ["adjustment_pct", "adjusted_ppsqft"]
+TOP_N = 10
+
+
+def compact(df):
+    df = df.copy()
+    for col in CATEGORY_COLUMNS:
+        if col in df:
+            df[col] = df[col].astype("category")
+    for col in FLOAT32_COLUMNS:
+        if col in df:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(np.float32)
+    return df
+
+
+def top_positions(values, n, ascending=False):
+    """Positions of the `n` largest (or smallest) non-NaN values, in rank order."""
+    values = np.asarray(values, dtype=np.float64)
+    valid = np.flatnonzero(~np.isnan(values))
+    key = values[valid] if ascending else -values[valid]
+    n = min(n, len(key))
+    if n == 0:
+        return valid[:0]
+    part = np.argpartition(key, n - 1)[:n]
+    return valid[part[np.argsort(key[part], kind="stable")]]
+
+
+def _first_positions(keys):
+    # Reversed so the first occurrence of a duplicate key wins
+    positions = np.arange(len(keys))
+    return dict(zip(keys[::-1], positions[::-1]))
+
+
+class ListingStore:
+    def __init__(self, df, top_n=TOP_N):
+        df = df.reset_index(drop=True)
+        if "adjusted_ppsqft" not in df and {"risk_adjusted_price", "lot_sqft"} <= set(df.columns):
+            lot_sqft = pd.to_numeric(df["lot_sqft"], errors="coerce").replace(0, np.nan)
+            df["adjusted_ppsqft"] = df["risk_adjusted_price"] / lot_sqft
+        self.df = compact(df)
+        self.top_n = top_n
+
+        self._by_address = _first_positions(self.df["address"].to_numpy()) if "address" in self.df else {}
+        self._by_id = _first_positions(self.df["property_id"].to_numpy()) if "property_id" in self.df else {}
+        self._by_zip = {}
+        if "zipcode" in self.df:
+            codes = self.df["zipcode"].cat.codes.to_numpy()
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(self.df["zipcode"].cat.categories) + 1))
+            self._by_zip = {
+                zip_code: order[bounds[i]:bounds[i + 1]]
+                for i, zip_code in enumerate(self.df["zipcode"].cat.categories)
+            }
+        self._rankings = {}
+        for col in RANKED_COLUMNS:
+            if col in self.df:
+                self._rank(col)
+
+    def __len__(self):
+        return len(self.df)
+
+    def _rank(self, col):
+        values = self.df[col].to_numpy()
+        self._rankings[col] = {
+            ascending: top_positions(values, self.top_n, ascending) for ascending in (False, True)
+        }
+
+    def position(self, address=None, property_id=None):
+        index, key = (self._by_id, property_id) if property_id is not None else (self._by_address, address)
+        return index.get(key)
+
+    def get(self, address=None, property_id=None):
+        """The listing's row as a Series, or None if it is not in the store."""
+        pos = self.position(address, property_id)
+        return None if pos is None else self.df.iloc[pos]
+
+    def in_zip(self, zip_code):
+        return self.df.iloc[self._by_zip.get(zip_code, np.array([], dtype=np.int64))]
+
+    def top(self, col, n=5, ascending=False):
+        ranked = self._rankings.get(col, {}).get(ascending)
+        if ranked is None or n > self.top_n:
+            ranked = top_positions(self.df[col].to_numpy(), n, ascending)
+        return self.df.iloc[ranked[:n]]
+
+    def set_column(self, col, values):
+        """Replaces a column (e.g. after re-pricing) and refreshes its ranking."""
+        self.df[col] = np.asarray(values, dtype=np.float32) if col in FLOAT32_COLUMNS else values
+        if col in RANKED_COLUMNS:
+            self._rank(col)
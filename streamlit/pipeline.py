@@ -0,0 +1,101 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import metrics
+from listing_cache import ListingCache, load_listings
+from pricing import PENALTY_WEIGHT, price_listings
+from realtor import RealtorClient
+from risk_grid import GridIndex, build_index
+from score_store import ScoreStore
+
+# A CSV score table, or a score store directory (see score_store.py)
+SCORES_PATH = os.environ.get(
+    "SCORES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "phoenix_scores.csv")
+)
+
+PHOENIX_ZIPS = [
+    "85003", "85004", "85006", "85007", "85008", "85009", "85012",
+    "85013", "85014", "85015", "85016", "85017", "85018", "85020",
+    "85021", "85022", "85023", "85024", "85027", "85028", "85029",
+    "85031", "85032", "85033", "85034", "85035", "85037", "85040",
+    "85041", "85042", "85043", "85044", "85045", "85048", "85050",
+    "85051", "85053", "85054", "85083", "85085", "85086", "85087"
+]
+
+
+def load_scores(path=SCORES_PATH):
+    return pd.read_csv(path)
+
+
+class PricingPipeline:
+    """Match listings to the nearest `std_score` and price them.
+
+    Holds the score lookup index (an in-memory grid/KD-tree, or a
+    memory-mapped ScoreStore), so one instance can be kept warm and reused
+    by the app, the CLI and the HTTP service.
+    """
+
+    def __init__(self, index, score_range, model="linear", weight=PENALTY_WEIGHT, method="nearest"):
+        self.index = index
+        self.score_range = score_range
+        self.model = model
+        self.weight = weight
+        if method == "bilinear" and not isinstance(self.index, GridIndex):
+            method = "nearest"
+        self.method = method
+
+    @classmethod
+    def from_scores(cls, df_scores, **kwargs):
+        score_range = (df_scores["std_score"].min(), df_scores["std_score"].max())
+        return cls(build_index(df_scores), score_range, **kwargs)
+
+    @classmethod
+    def from_store(cls, root, **kwargs):
+        store = ScoreStore(root)
+        return cls(store, store.score_range, **kwargs)
+
+    @classmethod
+    def from_path(cls, path=SCORES_PATH, **kwargs):
+        with metrics.stage("load_scores"):
+            if os.path.isdir(path):
+                return cls.from_store(path, **kwargs)
+            return cls.from_scores(load_scores(path), **kwargs)
+
+    def zips(self):
+        """ZIPs to fetch listings for: every region in a score store, else Phoenix."""
+        if isinstance(self.index, ScoreStore):
+            return self.index.region_zips() or PHOENIX_ZIPS
+        return PHOENIX_ZIPS
+
+    def match(self, df, lat_col="nearest_lat", lon_col="nearest_lon", method=None):
+        with metrics.stage("match", rows=len(df)):
+            df = df.dropna(subset=[lat_col, lon_col]).copy()
+            df["std_score"] = self.index.lookup(
+                df[lat_col].to_numpy(dtype=np.float64),
+                df[lon_col].to_numpy(dtype=np.float64),
+                method=method or self.method
+            )
+            df = df.dropna(subset=["std_score"])
+        metrics.incr("rows_matched", len(df))
+        return df
+
+    def price(self, df, price_col="base_price", relative=False):
+        # `relative` scales the linear model over this batch instead of the full score table
+        with metrics.stage("price", rows=len(df)):
+            df = price_listings(
+                df, model=self.model, price_col=price_col, weight=self.weight,
+                score_range=None if relative else self.score_range
+            )
+        metrics.incr("rows_priced", len(df))
+        return df
+
+    def run(self, df, lat_col="nearest_lat", lon_col="nearest_lon", price_col="base_price",
+            relative=False):
+        return self.price(self.match(df, lat_col, lon_col), price_col, relative)
+
+    def fetch_and_price(self, zips, api_key, cache=None, on_error=None, relative=True):
+        with RealtorClient(api_key) as client:
+            df = load_listings(client, cache or ListingCache(), zips, on_error=on_error)
+        return self.run(df, relative=relative)
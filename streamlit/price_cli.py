@@ -0,0 +1,56 @@
+"""Bulk risk-adjusted pricing without the Streamlit UI.
+
+    python streamlit/price_cli.py listings.csv priced.parquet --model capi
+
+Input and output may be CSV or Parquet (chosen by file extension). The
+input needs coordinate columns (nearest_lat/nearest_lon or lat/lon) and,
+unless --scores-only is given, a price column (base_price or price).
+The file is processed --chunk-rows rows at a time, so it never has to fit
+in memory.
+"""
+import argparse
+import sys
+
+from batch_pricing import CHUNK_ROWS, NUMERIC_COLUMNS, TableWriter, iter_table, price_stream
+from instrumentation import Profile, metrics
+from pipeline import SCORES_PATH, PricingPipeline
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Price listings or coordinates in bulk.")
+    parser.add_argument("input", help="CSV or Parquet file of listings/coordinates")
+    parser.add_argument("output", help="CSV or Parquet file to write")
+    parser.add_argument("--scores", default=SCORES_PATH, help="std_score CSV (lat, lon, std_score) or score store directory")
+    parser.add_argument("--model", choices=["linear", "capi"], default="linear")
+    parser.add_argument("--weight", type=float, default=None, help="linear model penalty weight")
+    parser.add_argument("--interpolate", action="store_true", help="bilinear score lookup")
+    parser.add_argument("--lat-col")
+    parser.add_argument("--lon-col")
+    parser.add_argument("--price-col")
+    parser.add_argument("--scores-only", action="store_true", help="only attach std_score")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="rows read and priced at a time")
+    args = parser.parse_args(argv)
+
+    metrics.start_run()
+    profile = Profile("price_cli").start()
+    kwargs = {"model": args.model, "method": "bilinear" if args.interpolate else "nearest"}
+    if args.weight is not None:
+        kwargs["weight"] = args.weight
+    pipeline = PricingPipeline.from_path(args.scores, **kwargs)
+
+    numeric = NUMERIC_COLUMNS + [c for c in (args.lat_col, args.lon_col, args.price_col) if c]
+    try:
+        with TableWriter(args.output) as writer:
+            rows = price_stream(
+                pipeline, iter_table(args.input, args.chunk_rows, numeric=numeric), writer,
+                args.lat_col, args.lon_col, args.price_col, args.scores_only
+            )
+    except ValueError as e:
+        parser.error(str(e))
+    profile.stop()
+    metrics.end_run()
+    print(f"Priced {rows} rows -> {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Small HTTP pricing service that keeps the score index warm in memory.
+
+    python streamlit/price_server.py --port 8000
+
+    POST /price   [{"lat": 33.45, "lon": -112.07, "price": 450000}, ...]
+                  one priced row per record, in order; unpriceable rows carry an "error"
+    GET  /history?lat=33.45&lon=-112.07&start=2020-01-01&end=2020-12-31
+                  weekly risk trajectory and window std_score (needs a history store)
+    GET  /health
+    GET  /metrics  Prometheus text format (see instrumentation.py)
+"""
+import argparse
+import json
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import metrics
+from pipeline import SCORES_PATH, PricingPipeline
+from risk_history import DEFAULT_HISTORY_PATH, RiskHistory
+
+PRICED_COLUMNS = ["std_score", "risk_adjusted_price", "adjustment_pct"]
+
+
+def price_records(pipeline, records):
+    """Prices a list of JSON objects; the response has one row per record, in order.
+
+    A record that can't be priced (missing or non-numeric lat/lon/price, or
+    outside score coverage) comes back with null prices and an "error".
+    """
+    for i, record in enumerate(records):
+        if not isinstance(record, dict):
+            raise ValueError(f"Record {i} is not a JSON object")
+    if not records:
+        return []
+
+    df = pd.DataFrame.from_records(records).drop(columns=PRICED_COLUMNS, errors="ignore")
+    for col in ("lat", "lon", "price"):
+        df[col] = pd.to_numeric(df[col], errors="coerce") if col in df.columns else np.nan
+    priced = pipeline.run(df, lat_col="lat", lon_col="lon", price_col="price")
+    # match() drops unpriceable rows but keeps the index, so results realign by label
+    df = df.join(priced[PRICED_COLUMNS])
+
+    df["error"] = None
+    df.loc[df["std_score"].isna(), "error"] = "outside score coverage"
+    df.loc[df["price"].isna(), "error"] = "missing or non-numeric price"
+    df.loc[df["lat"].isna() | df["lon"].isna(), "error"] = "missing or non-numeric lat/lon"
+    return json.loads(df.to_json(orient="records"))
+
+
+def history_query(history, params):
+    try:
+        lat, lon = float(params["lat"][0]), float(params["lon"][0])
+    except (KeyError, ValueError):
+        raise ValueError("Query needs numeric 'lat' and 'lon'")
+    start, end = params.get("start", [None])[0], params.get("end", [None])[0]
+    cell = int(history.cell_ids(lat, lon))
+    trajectory = history.trajectory(lat, lon, start, end)
+    count, mean, std = history.window_stats(start, end, [cell])
+    return {
+        "cell": cell,
+        "cell_lat": float(history.cells[cell, 0]),
+        "cell_lon": float(history.cells[cell, 1]),
+        "weeks": trajectory["time"].dt.strftime("%Y-%m-%d").tolist(),
+        "risk_score": trajectory[history.score_col].astype(float).round(4).tolist(),
+        "count": int(count[0]),
+        "mean": None if count[0] == 0 else float(mean[0]),
+        "std_score": None if count[0] < 2 else float(std[0]),
+    }
+
+
+def make_handler(pipeline, history=None):
+    class PriceHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status, body):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path == "/history":
+                if history is None:
+                    self._send_json(404, {"error": "no risk history store loaded"})
+                    return
+                try:
+                    with metrics.stage("history_request"):
+                        self._send_json(200, history_query(history, parse_qs(url.query)))
+                except ValueError as e:
+                    self._send_json(400, {"error": str(e)})
+            elif url.path == "/metrics":
+                payload = metrics.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            elif url.path == "/health":
+                self._send_json(200, {"status": "ok", "index": type(pipeline.index).__name__})
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if urlsplit(self.path).path != "/price":
+                self._send_json(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                records = json.loads(self.rfile.read(length) or b"[]")
+                if not isinstance(records, list):
+                    raise ValueError("Expected a JSON array of records")
+                with metrics.stage("request", records=len(records)):
+                    self._send_json(200, price_records(pipeline, records))
+            except ValueError as e:
+                self._send_json(400, {"error": str(e)})
+
+        def log_message(self, format, *args):
+            pass
+
+    return PriceHandler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve risk-adjusted pricing over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--scores", default=SCORES_PATH, help="CSV score table or score store directory")
+    parser.add_argument("--model", choices=["linear", "capi"], default="linear")
+    parser.add_argument("--interpolate", action="store_true")
+    parser.add_argument("--history", default=DEFAULT_HISTORY_PATH, help="risk history store directory, if any")
+    args = parser.parse_args(argv)
+
+    pipeline = PricingPipeline.from_path(
+        args.scores, model=args.model, method="bilinear" if args.interpolate else "nearest"
+    )
+    history = RiskHistory(args.history) if os.path.isdir(args.history) else None
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(pipeline, history))
+    print(f"Serving /price on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import numpy as np
+
+# CAPI parameters based on the report
+ALPHA = 0.5      # Premium coefficient for CRS <= THRESHOLD
+BETA = 0.4       # Penalty coefficient for CRS > THRESHOLD
+THRESHOLD = 0.2  # CRS threshold
+
+# Linear model: price * (1 - weight * risk scaled to [0, 1])
+PENALTY_WEIGHT = 0.2
+
+
+def capi_factor(crs, alpha=ALPHA, beta=BETA, threshold=THRESHOLD):
+    """Piecewise CAPI multiplier, evaluated over whole arrays at once.
+
+    CRS at or below the threshold earns a linear premium, anything above it
+    a quadratic penalty. NaN scores give a NaN factor.
+    """
+    diff = np.asarray(crs, dtype=np.float64) - threshold
+    return np.where(diff <= 0, 1 - alpha * diff, 1 - beta * diff * diff)
+
+
+def capi_price(price, crs, alpha=ALPHA, beta=BETA, threshold=THRESHOLD):
+    return np.asarray(price, dtype=np.float64) * capi_factor(crs, alpha, beta, threshold)
+
+
+def minmax_scale(scores, lo=None, hi=None):
+    scores = np.asarray(scores, dtype=np.float64)
+    lo = np.nanmin(scores) if lo is None else lo
+    hi = np.nanmax(scores) if hi is None else hi
+    return (scores - lo) / (hi - lo)
+
+
+def linear_price(price, risk_scaled, weight=PENALTY_WEIGHT):
+    return np.asarray(price, dtype=np.float64) * (1 - weight * np.asarray(risk_scaled, dtype=np.float64))
+
+
+def adjustment_pct(adjusted, base):
+    base = np.asarray(base, dtype=np.float64)
+    return (np.asarray(adjusted, dtype=np.float64) - base) / base * 100
+
+
+def price_listings(df, model="linear", price_col="base_price", score_col="std_score",
+                   weight=PENALTY_WEIGHT, score_range=None,
+                   alpha=ALPHA, beta=BETA, threshold=THRESHOLD):
+    """Adds numeric `risk_adjusted_price` and `adjustment_pct` columns to `df`.
+
+    `model` is "linear" (scores min-max scaled over `score_range`, or over
+    `df` itself when not given) or "capi" (raw scores fed to the piecewise
+    model).
+    """
+    price = df[price_col].to_numpy(dtype=np.float64, na_value=np.nan)
+    scores = df[score_col].to_numpy(dtype=np.float64, na_value=np.nan)
+    if model == "linear":
+        lo, hi = score_range if score_range is not None else (None, None)
+        adjusted = linear_price(price, minmax_scale(scores, lo, hi), weight)
+    elif model == "capi":
+        adjusted = capi_price(price, scores, alpha, beta, threshold)
+    else:
+        raise ValueError(f"Unknown pricing model: {model!r}")
+
+    df["risk_adjusted_price"] = adjusted
+    df["adjustment_pct"] = adjustment_pct(adjusted, price)
+    return df
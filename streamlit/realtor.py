@@ -0,0 +1,216 @@
+import contextvars
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentation import metrics
+
+API_URL = "https://realty-in-us.p.rapidapi.com/properties/v3/list"
+API_HOST = "realty-in-us.p.rapidapi.com"
+
+LISTING_COLUMNS = [
+    "address", "city", "zipcode", "base_price", "nearest_lat", "nearest_lon",
+    "beds", "baths", "lot_sqft", "type", "url", "property_id", "list_date"
+]
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class QuotaExceeded(RuntimeError):
+    pass
+
+
+def listing_id(home):
+    return home.get("property_id") or home.get("listing_id") or home.get("href")
+
+
+def parse_listings(listings):
+    records = []
+    for home in listings:
+        try:
+            location = home.get("location", {}).get("address", {})
+            coord = location.get("coordinate", {})
+            if not coord.get("lat") or not coord.get("lon"):
+                continue
+            desc = home.get("description", {}) or {}
+            records.append({
+                "address": location.get("line", "N/A"),
+                "city": location.get("city", "N/A"),
+                "zipcode": location.get("postal_code", "N/A"),
+                "base_price": home.get("list_price", None),
+                "nearest_lat": coord.get("lat"),
+                "nearest_lon": coord.get("lon"),
+                "beds": desc.get("beds", None),
+                "baths": desc.get("baths", None),
+                "lot_sqft": desc.get("lot_sqft", None),
+                "type": desc.get("type", None),
+                "url": home.get("href", None),
+                "property_id": listing_id(home),
+                "list_date": home.get("list_date", None)
+            })
+        except Exception:
+            continue
+    return records
+
+
+class RealtorClient:
+    """Fetches /properties/v3/list for many ZIPs over a pooled, bounded thread pool.
+
+    Every ZIP is paged with `offset` until the API runs out of results, so a
+    ZIP with more than `page_size` listings is no longer silently truncated.
+
+    With a `rate_limiter` (e.g. refresher.TokenBucket) every request first
+    takes a token. With a `quota` (e.g. refresher.MonthlyQuota) every
+    request, retries included, is reserved before it is sent, and
+    QuotaExceeded is raised once the quota is used up. 429 and 5xx
+    responses are retried up to `retries` times with exponential backoff
+    and full jitter, honouring Retry-After.
+    """
+
+    def __init__(self, api_key, url=API_URL, page_size=200, max_workers=8,
+                 max_pages=None, timeout=30, rate_limiter=None, quota=None, retries=0,
+                 backoff=0.5, max_backoff=30.0):
+        self.url = url
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.max_pages = max_pages
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.quota = quota
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.requests_sent = 0
+        self._lock = threading.Lock()
+
+        # One keep-alive pool sized to the worker count, shared by all threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "content-type": "application/json",
+            "X-RapidAPI-Key": api_key,
+            "X-RapidAPI-Host": API_HOST
+        })
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def retry_delay(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def post(self, payload):
+        for attempt in range(self.retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            if self.quota is not None and not self.quota.reserve():
+                raise QuotaExceeded("Monthly API request quota used up")
+            response = self.session.post(self.url, json=payload, timeout=self.timeout)
+            with self._lock:
+                self.requests_sent += 1
+            metrics.incr("requests")
+            metrics.incr("bytes_fetched", len(response.content))
+            if response.status_code not in RETRY_STATUS or attempt == self.retries:
+                return response
+            metrics.incr("request_retries")
+            time.sleep(self.retry_delay(attempt, response))
+
+    def fetch_page(self, zip_code, offset=0):
+        payload = {
+            "limit": self.page_size,
+            "offset": offset,
+            "postal_code": zip_code,
+            "status": ["for_sale"],
+            "sort": {"direction": "desc", "field": "list_date"}
+        }
+        response = self.post(payload)
+        response.raise_for_status()
+        search = (response.json().get("data") or {}).get("home_search") or {}
+        return search.get("results") or [], search.get("total")
+
+    def _next_offsets(self, offset, n_results, total, incremental=False):
+        # A short page means the ZIP is exhausted
+        if n_results < self.page_size:
+            return []
+        last = float("inf") if self.max_pages is None else self.max_pages * self.page_size
+        if total is not None and not incremental:
+            # The first page tells us how many pages remain: schedule them all at once
+            if offset != 0:
+                return []
+            return list(range(self.page_size, int(min(total, last)), self.page_size))
+        next_offset = offset + self.page_size
+        return [next_offset] if next_offset < last else []
+
+    def fetch_pages(self, zips, on_error=None, known_ids=None):
+        """Returns {zip_code: [raw listing, ...]} with pages kept in offset order.
+
+        `known_ids` maps a ZIP to listing ids that are already cached. Those
+        ZIPs are paged one page at a time and stop at the first known
+        listing, since results come back newest first.
+        """
+        known_ids = known_ids or {}
+        pages = {z: {} for z in zips}
+        with metrics.stage("fetch", zips=len(pages)), \
+                ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+
+            def submit(zip_code, offset):
+                # Workers run in a copy of the caller's context, so their requests
+                # count towards the caller's run metrics (see instrumentation.py)
+                future = pool.submit(contextvars.copy_context().run, self.fetch_page, zip_code, offset)
+                pending[future] = (zip_code, offset)
+
+            pending = {}
+            for z in pages:
+                submit(z, 0)
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    zip_code, offset = pending.pop(future)
+                    try:
+                        listings, total = future.result()
+                    except Exception as e:
+                        metrics.incr("request_errors")
+                        if on_error is not None:
+                            on_error(zip_code, e)
+                        continue
+                    known = known_ids.get(zip_code)
+                    if known:
+                        stop = next((i for i, home in enumerate(listings)
+                                     if listing_id(home) in known), None)
+                        if stop is not None:
+                            pages[zip_code][offset] = listings[:stop]
+                            continue
+                    pages[zip_code][offset] = listings
+                    next_offsets = self._next_offsets(offset, len(listings), total, bool(known))
+                    for next_offset in next_offsets:
+                        submit(zip_code, next_offset)
+
+        return {
+            z: [home for offset in sorted(by_offset) for home in by_offset[offset]]
+            for z, by_offset in pages.items()
+        }
+
+    def fetch_listings(self, zips, on_error=None, known_ids=None):
+        pages = self.fetch_pages(zips, on_error=on_error, known_ids=known_ids)
+        records = [r for z in pages for r in parse_listings(pages[z])]
+        return pd.DataFrame(records, columns=LISTING_COLUMNS)
+
+
+def fetch_listings(zips, api_key, on_error=None, **kwargs):
+    with RealtorClient(api_key, **kwargs) as client:
+        return client.fetch_listings(zips, on_error=on_error)
@@ -0,0 +1,215 @@
+"""Background listing refresh that respects RapidAPI rate limits and quota.
+
+The refresher keeps the listing cache warm so the app only ever reads
+from SQLite. Each pass refreshes the stalest, most-queried ZIPs first,
+one small batch at a time; requests go through a token bucket sized to
+the plan (RAPIDAPI_RATE requests/s, bursts of RAPIDAPI_BURST) and
+429/5xx responses are retried with jittered exponential backoff. Once
+the month's requests reach RAPIDAPI_MONTHLY_QUOTA it stops fetching
+until the next month.
+
+The app starts it as a thread on the server's RAPIDAPI_KEY; the key
+visitors type into the app only gates access. To run it as its own
+process instead, set LISTING_REFRESHER=external for the app and run:
+
+    RAPIDAPI_KEY=... python streamlit/refresher.py --interval 300
+
+Point it at benchmarks/mock_realtor.py with --url to exercise it offline.
+"""
+import argparse
+import math
+import os
+import threading
+import time
+
+from instrumentation import log_event
+from listing_cache import ListingCache, refresh_listings
+from realtor import API_URL, QuotaExceeded, RealtorClient
+
+API_KEY = os.environ.get("RAPIDAPI_KEY")
+RATE = float(os.environ.get("RAPIDAPI_RATE", 5))
+BURST = int(os.environ.get("RAPIDAPI_BURST", 5))
+MONTHLY_QUOTA = int(os.environ.get("RAPIDAPI_MONTHLY_QUOTA", 0)) or None
+RETRIES = 5
+REFRESHER_MODE = os.environ.get("LISTING_REFRESHER", "thread")
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, at most `capacity` saved up."""
+
+    def __init__(self, rate=RATE, capacity=BURST, clock=time.monotonic):
+        if rate is None or not rate > 0:
+            raise ValueError(f"Token bucket rate must be > 0 requests/s, got {rate!r}")
+        if capacity is None or not capacity >= 1:
+            raise ValueError(f"Token bucket capacity must be at least 1, got {capacity!r}")
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens=1):
+        """Takes `tokens` and returns 0, or returns the seconds until they are available."""
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens=1):
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return
+            time.sleep(wait)
+
+
+class MonthlyQuota:
+    """Reserves each request against the month's quota in the listing cache before it is sent.
+
+    Usage is counted even with no limit, and before the response arrives,
+    so a batch that pages deeper than expected, or a process that dies
+    mid-batch, can't leave requests uncounted.
+    """
+
+    def __init__(self, cache, limit=MONTHLY_QUOTA):
+        self.cache = cache
+        self.limit = limit
+
+    def reserve(self):
+        return self.cache.reserve_requests(1, self.limit)
+
+    def left(self):
+        if self.limit is None:
+            return None
+        return self.limit - self.cache.requests_this_month()
+
+
+def make_client(api_key, url=API_URL, rate=RATE, burst=BURST, retries=RETRIES, **kwargs):
+    return RealtorClient(api_key, url=url, rate_limiter=TokenBucket(rate, burst), retries=retries, **kwargs)
+
+
+class ListingRefresher:
+    """Refreshes stale ZIPs in the background, most urgent first.
+
+    A ZIP's priority is its staleness (age over the cache TTL; never-fetched
+    ZIPs come first) weighted by how often the app has asked for it.
+    """
+
+    def __init__(self, client, cache, zips, interval=60, batch_size=4, monthly_quota=MONTHLY_QUOTA):
+        self.client = client
+        self.cache = cache
+        self.zips = list(dict.fromkeys(zips))
+        self.interval = interval
+        self.batch_size = batch_size
+        self.monthly_quota = monthly_quota
+        # The refresher's client spends its quota one reserved request at a time
+        if client.quota is None:
+            client.quota = MonthlyQuota(cache, monthly_quota)
+        self._retry_at = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def priorities(self, now=None):
+        """Stale ZIPs with their priority, highest first."""
+        now = time.time() if now is None else now
+        state = self.cache.state(self.zips)
+        demand = self.cache.demand(self.zips)
+        ranked = []
+        for z in self.zips:
+            if self._retry_at.get(z, 0) > now:
+                continue
+            if z not in state:
+                staleness = math.inf
+            else:
+                fetched_at, full_fetched_at = state[z]
+                staleness = max((now - fetched_at) / self.cache.ttl,
+                                (now - full_fetched_at) / self.cache.full_refresh_ttl)
+            if staleness >= 1:
+                ranked.append((z, staleness * (1 + math.log1p(demand.get(z, 0)))))
+        return sorted(ranked, key=lambda item: item[1], reverse=True)
+
+    def quota_left(self):
+        return self.client.quota.left()
+
+    def run_once(self):
+        """Refreshes the next batch of stale ZIPs; returns the ZIPs attempted."""
+        left = self.quota_left()
+        if left is not None and left <= 0:
+            log_event("refresh_quota_exhausted", quota=self.monthly_quota)
+            return []
+        batch = [z for z, _ in self.priorities()[:self.batch_size]]
+        if not batch:
+            return []
+
+        def on_error(zip_code, error):
+            if isinstance(error, QuotaExceeded):
+                log_event("refresh_quota_exhausted", zip=zip_code, quota=self.monthly_quota)
+            else:
+                log_event("refresh_error", zip=zip_code, error=str(error))
+
+        start = time.perf_counter()
+        failed = refresh_listings(self.client, self.cache, batch, on_error=on_error)
+        # A failed ZIP (retries already spent) sits out one interval instead of spinning
+        retry_at = time.time() + self.interval
+        self._retry_at.update((z, retry_at) for z in failed)
+        log_event("refresh", zips=batch, failed=sorted(failed),
+                  seconds=round(time.perf_counter() - start, 3))
+        return batch
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                refreshed = self.run_once()
+            except Exception as e:
+                log_event("refresh_error", error=repr(e))
+                refreshed = []
+            # Keep going while there is stale work; the token bucket paces the requests
+            if not refreshed:
+                self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name="listing-refresher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def main(argv=None):
+    from pipeline import SCORES_PATH, PricingPipeline
+
+    parser = argparse.ArgumentParser(description="Keep the listing cache fresh in the background.")
+    parser.add_argument("--zips", nargs="+", help="ZIPs to refresh (default: the score table's regions)")
+    parser.add_argument("--scores", default=SCORES_PATH)
+    parser.add_argument("--url", default=API_URL)
+    parser.add_argument("--interval", type=float, default=60, help="seconds between passes when all ZIPs are fresh")
+    parser.add_argument("--rate", type=float, default=RATE, help="requests per second")
+    parser.add_argument("--burst", type=int, default=BURST)
+    parser.add_argument("--quota", type=int, default=MONTHLY_QUOTA, help="requests per calendar month")
+    parser.add_argument("--once", action="store_true", help="refresh everything stale once and exit")
+    args = parser.parse_args(argv)
+
+    if not API_KEY:
+        parser.error("set RAPIDAPI_KEY")
+    zips = args.zips or PricingPipeline.from_path(args.scores).zips()
+    with make_client(API_KEY, args.url, args.rate, args.burst) as client:
+        refresher = ListingRefresher(client, ListingCache(), zips, args.interval, monthly_quota=args.quota)
+        if args.once:
+            while refresher.run_once():
+                pass
+        else:
+            refresher.run()
+
+
+if __name__ == "__main__":
+    main()
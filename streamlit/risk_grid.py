@@ -0,0 +1,109 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+def _axis(values, tol):
+    """Returns (origin, step, size) if `values` lie on an evenly spaced axis, else None."""
+    axis = np.unique(values)
+    if len(axis) == 1:
+        return axis[0], 1.0, 1
+    steps = np.diff(axis)
+    step = steps.mean()
+    if np.abs(steps - step).max() > tol:
+        return None
+    return axis[0], step, len(axis)
+
+
+class GridIndex:
+    """Score lookup for a complete, regular lat/lon lattice (e.g. GridMET cells).
+
+    Coordinates map straight to cell indices with arithmetic, so a batch of
+    N points costs O(N) with no tree to build or search. Points outside the
+    lattice snap to the nearest edge cell, like a nearest-neighbour query.
+    """
+
+    def __init__(self, lat0, lon0, lat_step, lon_step, rows, values):
+        self.lat0 = lat0
+        self.lon0 = lon0
+        self.lat_step = lat_step
+        self.lon_step = lon_step
+        self.rows = rows        # (n_lat, n_lon) positions into the source frame
+        self.values = values    # (n_lat, n_lon) scores
+
+    @classmethod
+    def from_points(cls, lats, lons, values, tol=1e-6):
+        """Returns a GridIndex, or None if the points are not a complete regular lattice."""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        lat_axis, lon_axis = _axis(lats, tol), _axis(lons, tol)
+        if lat_axis is None or lon_axis is None:
+            return None
+        (lat0, lat_step, n_lat), (lon0, lon_step, n_lon) = lat_axis, lon_axis
+        if n_lat * n_lon != len(lats):
+            return None
+
+        i = np.rint((lats - lat0) / lat_step).astype(np.intp)
+        j = np.rint((lons - lon0) / lon_step).astype(np.intp)
+        rows = np.full((n_lat, n_lon), -1, dtype=np.intp)
+        rows[i, j] = np.arange(len(lats))
+        if (rows < 0).any():
+            return None
+        return cls(lat0, lon0, lat_step, lon_step, rows,
+                   np.asarray(values, dtype=np.float64)[rows])
+
+    def _fractional(self, lat, lon):
+        fi = (np.asarray(lat, dtype=np.float64) - self.lat0) / self.lat_step
+        fj = (np.asarray(lon, dtype=np.float64) - self.lon0) / self.lon_step
+        n_lat, n_lon = self.rows.shape
+        return np.clip(fi, 0, n_lat - 1), np.clip(fj, 0, n_lon - 1)
+
+    def nearest(self, lat, lon):
+        """Positions (into the source frame) of the cell containing each point."""
+        fi, fj = self._fractional(lat, lon)
+        return self.rows[np.rint(fi).astype(np.intp), np.rint(fj).astype(np.intp)]
+
+    def lookup(self, lat, lon, method="nearest"):
+        if method == "nearest":
+            fi, fj = self._fractional(lat, lon)
+            return self.values[np.rint(fi).astype(np.intp), np.rint(fj).astype(np.intp)]
+        if method != "bilinear":
+            raise ValueError(f"Unknown lookup method: {method!r}")
+
+        # Blend the four surrounding cell centres so scores don't jump at cell edges
+        fi, fj = self._fractional(lat, lon)
+        n_lat, n_lon = self.rows.shape
+        i0 = np.minimum(np.floor(fi).astype(np.intp), max(n_lat - 2, 0))
+        j0 = np.minimum(np.floor(fj).astype(np.intp), max(n_lon - 2, 0))
+        i1 = np.minimum(i0 + 1, n_lat - 1)
+        j1 = np.minimum(j0 + 1, n_lon - 1)
+        wi = fi - i0
+        wj = fj - j0
+        v = self.values
+        top = v[i0, j0] * (1 - wj) + v[i0, j1] * wj
+        bottom = v[i1, j0] * (1 - wj) + v[i1, j1] * wj
+        return top * (1 - wi) + bottom * wi
+
+
+class KDTreeIndex:
+    """Nearest-neighbour fallback for score sets that are not a regular lattice."""
+
+    def __init__(self, lats, lons, values):
+        self.tree = cKDTree(np.column_stack([lats, lons]))
+        self.values = np.asarray(values, dtype=np.float64)
+
+    def nearest(self, lat, lon):
+        _, idx = self.tree.query(np.column_stack([np.ravel(lat), np.ravel(lon)]), k=1)
+        return idx.reshape(np.shape(lat))
+
+    def lookup(self, lat, lon, method="nearest"):
+        if method != "nearest":
+            raise ValueError(f"{method!r} lookup needs a regular grid")
+        return self.values[self.nearest(lat, lon)]
+
+
+def build_index(df_scores, lat_col="lat", lon_col="lon", value_col="std_score"):
+    lats = df_scores[lat_col].to_numpy()
+    lons = df_scores[lon_col].to_numpy()
+    values = df_scores[value_col].to_numpy()
+    grid = GridIndex.from_points(lats, lons, values)
+    return grid if grid is not None else KDTreeIndex(lats, lons, values)
@@ -0,0 +1,135 @@
+"""Week-by-week risk history per grid cell, for trajectory and window queries.
+
+The notebook's per-week `risk_df` (time, lat, lon, scaled risk score) is
+pivoted into a dense cell x week array instead of being collapsed to one
+std_score per cell:
+
+    <root>/manifest.json   shapes, score column
+    <root>/cells.npy       (cells, 2) lat, lon; the row number is the cell id
+    <root>/weeks.npy       (weeks,) datetime64[D]
+    <root>/scores.npy      (cells, weeks) float32, NaN where a week is missing
+
+The score array is memory-mapped. A point maps to its cell id through
+the same grid/KD-tree index as the score lookup, and a date range maps to
+week columns with a binary search. A window's mean and std_score per cell
+are one reduction over that column slice, so no query scans the long
+frame and nothing larger than the float32 scores is stored.
+
+    python streamlit/risk_history.py risk_df.parquet risk_history
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from risk_grid import GridIndex, KDTreeIndex
+
+MANIFEST = "manifest.json"
+SCORE_COL = "risk_score_scaled_1_10"
+CHUNK_CELLS = 1 << 16
+DEFAULT_HISTORY_PATH = os.environ.get(
+    "RISK_HISTORY_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "risk_history")
+)
+
+
+class RiskHistory:
+    def __init__(self, root):
+        self.root = root
+        with open(os.path.join(root, MANIFEST)) as f:
+            manifest = json.load(f)
+        self.score_col = manifest["score_col"]
+        self.cells = np.load(os.path.join(root, "cells.npy"))
+        self.weeks = np.load(os.path.join(root, "weeks.npy"))
+        self.scores = np.load(os.path.join(root, "scores.npy"), mmap_mode="r")
+
+        lats, lons = self.cells[:, 0], self.cells[:, 1]
+        ids = np.arange(len(self.cells))
+        self.index = GridIndex.from_points(lats, lons, ids) or KDTreeIndex(lats, lons, ids)
+
+    def cell_ids(self, lat, lon):
+        return np.asarray(self.index.nearest(lat, lon))
+
+    def week_range(self, start=None, end=None):
+        """Half-open column range [a, b) of the weeks between `start` and `end`, inclusive."""
+        a = 0 if start is None else int(np.searchsorted(self.weeks, np.datetime64(start, "D"), "left"))
+        b = len(self.weeks) if end is None else int(np.searchsorted(self.weeks, np.datetime64(end, "D"), "right"))
+        return a, max(a, b)
+
+    def trajectory(self, lat, lon, start=None, end=None):
+        """Weekly risk scores at the cell nearest (lat, lon), as a (time, score) frame."""
+        cell = int(self.cell_ids(lat, lon))
+        a, b = self.week_range(start, end)
+        return pd.DataFrame({"time": self.weeks[a:b], self.score_col: self.scores[cell, a:b]}).dropna()
+
+    def window_stats(self, start=None, end=None, cell_ids=None, ddof=1):
+        """(count, mean, std) of each cell's scores over the window; std is NaN below ddof + 1 weeks."""
+        a, b = self.week_range(start, end)
+        ids = np.arange(len(self.cells)) if cell_ids is None else np.atleast_1d(np.asarray(cell_ids))
+        n = np.zeros(len(ids), dtype=np.int64)
+        mean = np.full(len(ids), np.nan)
+        std = np.full(len(ids), np.nan)
+        # Blocks of cells keep the float64 working copy small however large the store is
+        for i in range(0, len(ids), CHUNK_CELLS):
+            block = np.array(self.scores[ids[i:i + CHUNK_CELLS], a:b], dtype=np.float64)
+            seen = ~np.isnan(block)
+            block[~seen] = 0.0
+            count = seen.sum(axis=1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                m = block.sum(axis=1) / count
+                dev = np.where(seen, block - m[:, None], 0.0)
+                var = (dev * dev).sum(axis=1) / (count - ddof)
+            n[i:i + len(block)] = count
+            mean[i:i + len(block)] = m
+            std[i:i + len(block)] = np.where(count > ddof, np.sqrt(var), np.nan)
+        return n, mean, std
+
+    def window_std(self, start=None, end=None, cell_ids=None):
+        return self.window_stats(start, end, cell_ids)[2]
+
+    def std_scores(self, start=None, end=None):
+        """A (lat, lon, std_score) table over the window, like phoenix_scores.csv."""
+        return pd.DataFrame({
+            "lat": self.cells[:, 0], "lon": self.cells[:, 1], "std_score": self.window_std(start, end)
+        })
+
+
+def build_history(risk_df, root, score_col=SCORE_COL):
+    """Writes `risk_df` (time, lat, lon, `score_col`) to a history store at `root`."""
+    cell_codes, cells = pd.MultiIndex.from_arrays([risk_df["lat"], risk_df["lon"]]).factorize()
+    time = pd.to_datetime(risk_df["time"]).to_numpy().astype("datetime64[D]")
+    weeks, week_codes = np.unique(time, return_inverse=True)
+
+    scores = np.full((len(cells), len(weeks)), np.nan, dtype=np.float32)
+    scores[cell_codes, week_codes.ravel()] = risk_df[score_col].to_numpy(dtype=np.float32)
+
+    os.makedirs(root, exist_ok=True)
+    np.save(os.path.join(root, "cells.npy"), np.array(cells.tolist(), dtype=np.float64).reshape(-1, 2))
+    np.save(os.path.join(root, "weeks.npy"), weeks)
+    np.save(os.path.join(root, "scores.npy"), scores)
+    with open(os.path.join(root, MANIFEST), "w") as f:
+        json.dump({
+            "score_col": score_col, "cells": len(cells), "weeks": len(weeks),
+            "start": str(weeks[0]), "end": str(weeks[-1]),
+        }, f, indent=1)
+    return RiskHistory(root)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a risk history store from the notebook's risk_df.")
+    parser.add_argument("risk_df", help="CSV or Parquet with time, lat, lon and the scaled score")
+    parser.add_argument("root", help="history store directory")
+    parser.add_argument("--score-col", default=SCORE_COL)
+    args = parser.parse_args(argv)
+
+    if os.path.splitext(args.risk_df)[1].lower() in (".parquet", ".pq"):
+        risk_df = pd.read_parquet(args.risk_df)
+    else:
+        risk_df = pd.read_csv(args.risk_df)
+    history = build_history(risk_df, args.root, args.score_col)
+    print(f"{args.root}: {len(history.cells)} cells x {len(history.weeks)} weeks")
+
+
+if __name__ == "__main__":
+    main()
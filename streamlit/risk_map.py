@@ -0,0 +1,106 @@
+"""Risk map layers that stay small at metro and multi-metro listing counts.
+
+Below POINT_THRESHOLD homes the map shows individual points. Above it,
+homes are binned on the server into a lat/lon grid sized to the zoom
+level (count, mean std_score, mean adjustment per bin), so the browser
+gets one row per bin. In both modes only the columns the layer and
+tooltip use are sent, as rounded float32, with the colour precomputed.
+Only `risk_map` needs pydeck; the binning runs without it.
+"""
+import numpy as np
+import pandas as pd
+
+POINT_THRESHOLD = 5000
+BIN_PIXELS = 24
+
+
+def fit_zoom(lat, lon, width_px=700):
+    """Web-mercator zoom level that fits the points' extent into `width_px`."""
+    span = max(np.nanmax(lon) - np.nanmin(lon), np.nanmax(lat) - np.nanmin(lat), 1e-3)
+    return int(np.clip(np.floor(np.log2(360 * width_px / 256 / span)), 3, 15))
+
+
+def bin_size(zoom, pixels=BIN_PIXELS):
+    """Bin edge in degrees: about `pixels` screen pixels at `zoom`."""
+    return pixels * 360 / (256 * 2 ** zoom)
+
+
+def _color(std_score):
+    return np.clip(255 * np.nan_to_num(std_score), 0, 255).astype(np.uint8)
+
+
+def aggregate_bins(lat, lon, std_score, adjustment_pct, cell_deg):
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    i = np.floor(lat / cell_deg).astype(np.int64)
+    j = np.floor(lon / cell_deg).astype(np.int64)
+    codes, _ = pd.factorize(i * (1 << 32) + j)
+    n_bins = codes.max() + 1 if len(codes) else 0
+    count = np.bincount(codes, minlength=n_bins)
+
+    def mean(values):
+        values = np.asarray(values, dtype=np.float64)
+        ok = ~np.isnan(values)
+        total = np.bincount(codes[ok], weights=values[ok], minlength=n_bins)
+        n = np.bincount(codes[ok], minlength=n_bins)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return total / n
+
+    bins = pd.DataFrame({
+        "lon": mean(lon).astype(np.float32),
+        "lat": mean(lat).astype(np.float32),
+        "count": count.astype(np.int32),
+        "std_score": mean(std_score).round(3).astype(np.float32),
+        "adjustment_pct": mean(adjustment_pct).round(1).astype(np.float32),
+    })
+    bins["r"] = _color(bins["std_score"])
+    return bins
+
+
+def point_frame(df, lat_col="nearest_lat", lon_col="nearest_lon"):
+    points = pd.DataFrame({
+        "lon": df[lon_col].to_numpy(dtype=np.float32),
+        "lat": df[lat_col].to_numpy(dtype=np.float32),
+        "std_score": df["std_score"].to_numpy(dtype=np.float32).round(3),
+        "base_price": df["base_price"].to_numpy(dtype=np.float64, na_value=np.nan).round(),
+        "address": df["address"].to_numpy(),
+    })
+    points["r"] = _color(points["std_score"])
+    return points
+
+
+def risk_map(df, zoom=None, point_threshold=POINT_THRESHOLD,
+             lat_col="nearest_lat", lon_col="nearest_lon"):
+    import pydeck as pdk
+
+    lat = df[lat_col].to_numpy(dtype=np.float64)
+    lon = df[lon_col].to_numpy(dtype=np.float64)
+    zoom = fit_zoom(lat, lon) if zoom is None else zoom
+    view = pdk.ViewState(latitude=float(np.nanmean(lat)), longitude=float(np.nanmean(lon)), zoom=zoom)
+
+    if len(df) <= point_threshold:
+        layer = pdk.Layer(
+            "ScatterplotLayer",
+            data=point_frame(df, lat_col, lon_col),
+            get_position="[lon, lat]",
+            get_color="[r, 50, 150]",
+            get_radius=100,
+            pickable=True
+        )
+        tooltip = {"text": "{address}\\nPrice: ${base_price}\\nRisk: {std_score}"}
+    else:
+        cell_deg = bin_size(zoom)
+        bins = aggregate_bins(lat, lon, df["std_score"], df["adjustment_pct"], cell_deg)
+        # Radius in metres: half a bin edge, growing gently with the bin's home count
+        half_edge_m = cell_deg * 111_000 / 2
+        layer = pdk.Layer(
+            "ScatterplotLayer",
+            data=bins,
+            get_position="[lon, lat]",
+            get_color="[r, 50, 150, 180]",
+            get_radius=f"{half_edge_m * 0.5:.0f} * (1 + Math.log10(count))",
+            pickable=True
+        )
+        tooltip = {"text": "{count} homes\\nMean risk: {std_score}\\nMean adjustment: {adjustment_pct}%"}
+
+    return pdk.Deck(initial_view_state=view, layers=[layer], tooltip=tooltip)
@@ -0,0 +1,134 @@
+"""Sensitivity analysis over many pricing scenarios in one NumPy pass.
+
+A scenario is one set of pricing parameters: a penalty weight for the
+linear model, or an (alpha, beta, threshold) triple for CAPI. Prices for
+every listing under every scenario are computed by broadcasting to a
+(listings x scenarios) matrix, so a slider over the scenarios is a column
+lookup instead of a recompute:
+
+    sweep = ScenarioSweep(df["base_price"], df["std_score"], linear_scenarios())
+    sweep.prices(weight=0.4)       # adjusted price per listing
+    sweep.summary                  # portfolio totals and percentile bands per scenario
+
+Score uncertainty is handled by Monte Carlo: `monte_carlo()` perturbs the
+scores `draws` times and reports percentiles of the portfolio value per
+scenario across the draws.
+"""
+import numpy as np
+import pandas as pd
+
+from pricing import ALPHA, BETA, THRESHOLD, adjustment_pct, capi_factor, minmax_scale
+
+PERCENTILES = (5, 50, 95)
+DRAW_BLOCK_CELLS = 1 << 20
+
+
+def linear_scenarios(weights=None):
+    weights = np.round(np.arange(0, 1.0001, 0.01), 2) if weights is None else weights
+    return pd.DataFrame({"weight": np.asarray(weights, dtype=np.float64)})
+
+
+def capi_scenarios(alphas=(ALPHA,), betas=(BETA,), thresholds=(THRESHOLD,)):
+    a, b, t = np.meshgrid(alphas, betas, thresholds, indexing="ij")
+    return pd.DataFrame({"alpha": a.ravel(), "beta": b.ravel(), "threshold": t.ravel()}).astype(np.float64)
+
+
+def _model(scenarios):
+    return "linear" if "weight" in scenarios else "capi"
+
+
+def scenario_factors(scores, scenarios, score_range=None):
+    """(listings x scenarios) price multipliers.
+
+    Linear scenarios scale `scores` to [0, 1] over `score_range` (or the
+    scores' own range); CAPI scenarios use the raw scores.
+    """
+    scores = np.asarray(scores, dtype=np.float64)[:, None]
+    if _model(scenarios) == "linear":
+        lo, hi = score_range if score_range is not None else (None, None)
+        weights = scenarios["weight"].to_numpy()[None, :]
+        return 1 - weights * minmax_scale(scores, lo, hi)
+    return capi_factor(
+        scores,
+        scenarios["alpha"].to_numpy()[None, :],
+        scenarios["beta"].to_numpy()[None, :],
+        scenarios["threshold"].to_numpy()[None, :],
+    )
+
+
+def portfolio_summary(price, adjusted, scenarios, percentiles=PERCENTILES):
+    """Per-scenario market vs adjusted value and bands of per-listing adjustment."""
+    price = np.asarray(price, dtype=np.float64)
+    # Listings without a score have no adjusted price; leave them out of both totals
+    market = np.nansum(np.where(np.isnan(adjusted).all(axis=1), np.nan, price))
+    total = np.nansum(adjusted, axis=0, dtype=np.float64)
+    pct = adjustment_pct(adjusted, price[:, None])
+    summary = scenarios.copy()
+    summary["market_value"] = market
+    summary["adjusted_value"] = total
+    summary["delta"] = total - market
+    summary["delta_pct"] = (total - market) / market * 100
+    for p, band in zip(percentiles, np.nanpercentile(pct, percentiles, axis=0)):
+        summary[f"adjustment_pct_p{p}"] = band
+    return summary
+
+
+def monte_carlo(price, scores, scenarios, score_sd, draws=200, score_range=None,
+                percentiles=PERCENTILES, seed=0):
+    """Percentiles across draws of each scenario's total adjusted value.
+
+    Each draw adds N(0, `score_sd`) noise to every score (`score_sd` may be
+    per listing). Linear scenarios are linear in the scaled score, so their
+    totals come from a (draws x listings) @ (listings,) product, computed
+    in blocks of draws; CAPI draws are evaluated one (listings x scenarios)
+    matrix at a time.
+    """
+    price = np.asarray(price, dtype=np.float64)
+    scores = np.asarray(scores, dtype=np.float64)
+    valid = ~(np.isnan(price) | np.isnan(scores))
+    price, scores = price[valid], scores[valid]
+    score_sd = np.broadcast_to(np.asarray(score_sd, dtype=np.float64), valid.shape)[valid]
+    if score_range is None:
+        score_range = (scores.min(), scores.max())
+
+    rng = np.random.default_rng(seed)
+    linear = _model(scenarios) == "linear"
+    # Draws are generated a block at a time, so memory stays near DRAW_BLOCK_CELLS
+    # values however many listings there are (the random stream is the same)
+    block = max(1, DRAW_BLOCK_CELLS // max(len(scores), 1))
+    totals = []
+    for start in range(0, draws, block):
+        n = min(block, draws - start)
+        noisy = scores + rng.standard_normal((n, len(scores))) * score_sd
+        if linear:
+            exposure = minmax_scale(noisy, *score_range) @ price
+            totals.append(price.sum() - np.outer(exposure, scenarios["weight"].to_numpy()))
+        else:
+            totals += [price @ scenario_factors(draw, scenarios, score_range) for draw in noisy]
+    totals = np.vstack(totals)
+
+    result = scenarios.copy()
+    for p, band in zip(percentiles, np.percentile(totals, percentiles, axis=0)):
+        result[f"adjusted_value_p{p}"] = band
+    return result
+
+
+class ScenarioSweep:
+    """Adjusted prices for every listing under every scenario, computed once."""
+
+    def __init__(self, price, scores, scenarios, score_range=None, percentiles=PERCENTILES):
+        self.price = np.asarray(price, dtype=np.float64)
+        self.scenarios = scenarios.reset_index(drop=True)
+        factors = scenario_factors(scores, self.scenarios, score_range)
+        # float32 halves the matrix. It keeps about 7 significant digits, so a listing is
+        # off by up to ~$0.03 at $1M; totals add those errors up and are display-grade only
+        self.adjusted = (self.price[:, None] * factors).astype(np.float32)
+        self.summary = portfolio_summary(self.price, self.adjusted, self.scenarios, percentiles)
+
+    def column(self, **params):
+        """Index of the scenario closest to `params`, e.g. `column(weight=0.4)`."""
+        distance = sum((self.scenarios[k].to_numpy() - v) ** 2 for k, v in params.items())
+        return int(np.argmin(distance))
+
+    def prices(self, **params):
+        return self.adjusted[:, self.column(**params)]
@@ -0,0 +1,171 @@
+"""Multi-region score store: tiled, memory-mapped `std_score` grids.
+
+All regions share one lat/lon lattice (GridMET is a single CONUS grid).
+The lattice is cut into `tile_size` x `tile_size` tiles, and each tile is
+a dense float32 .npy file (NaN where there is no score):
+
+    <root>/manifest.json          lattice, tile list, regions, score range
+    <root>/tiles/tile_<i>_<j>.npy
+
+Opening the store only reads the manifest. A lookup rounds each point to
+its lattice cell and pages in (mmap) only the tiles those cells fall in.
+Points outside every region get NaN rather than snapping to a faraway
+cell.
+
+    python streamlit/score_store.py phoenix_scores.csv scores_store --region phoenix --zips 85003 85004
+"""
+import argparse
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+MANIFEST = "manifest.json"
+
+
+def _min_step(values):
+    axis = np.unique(values)
+    return float(np.diff(axis).min()) if len(axis) > 1 else 1.0
+
+
+class ScoreStore:
+    def __init__(self, root, max_open_tiles=256):
+        self.root = root
+        with open(os.path.join(root, MANIFEST)) as f:
+            manifest = json.load(f)
+        lattice = manifest["lattice"]
+        self.lat0 = lattice["lat0"]
+        self.lon0 = lattice["lon0"]
+        self.lat_step = lattice["lat_step"]
+        self.lon_step = lattice["lon_step"]
+        self.tile_size = manifest["tile_size"]
+        self.tiles = set(manifest["tiles"])
+        self.regions = manifest["regions"]
+        self.score_range = tuple(manifest["score_range"])
+        self.max_open_tiles = max_open_tiles
+        self._open = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _tile(self, key):
+        with self._lock:
+            tile = self._open.get(key)
+            if tile is None:
+                tile = np.load(os.path.join(self.root, "tiles", f"tile_{key}.npy"), mmap_mode="r")
+                self._open[key] = tile
+                if len(self._open) > self.max_open_tiles:
+                    self._open.popitem(last=False)
+            else:
+                self._open.move_to_end(key)
+            return tile
+
+    def cells(self, lat, lon):
+        I = np.rint((np.asarray(lat, dtype=np.float64) - self.lat0) / self.lat_step).astype(np.int64)
+        J = np.rint((np.asarray(lon, dtype=np.float64) - self.lon0) / self.lon_step).astype(np.int64)
+        return I, J
+
+    def lookup(self, lat, lon, method="nearest"):
+        if method != "nearest":
+            raise ValueError(f"{method!r} lookup is not supported by the score store")
+        I, J = self.cells(lat, lon)
+        shape = I.shape
+        I, J = I.ravel(), J.ravel()
+        out = np.full(I.shape, np.nan)
+        if not len(I):
+            return out.reshape(shape)
+
+        # Group points by tile so each tile is paged in once
+        T = self.tile_size
+        tiles, inverse = np.unique(np.stack([I // T, J // T], axis=1), axis=0, return_inverse=True)
+        order = np.argsort(inverse.ravel(), kind="stable")
+        bounds = np.searchsorted(inverse.ravel()[order], np.arange(len(tiles) + 1))
+        for k, (ti, tj) in enumerate(tiles):
+            key = f"{ti}_{tj}"
+            if key not in self.tiles:
+                continue
+            sel = order[bounds[k]:bounds[k + 1]]
+            out[sel] = self._tile(key)[I[sel] - ti * T, J[sel] - tj * T]
+        return out.reshape(shape)
+
+    def region_zips(self, regions=None):
+        names = self.regions if regions is None else regions
+        return [z for name in names for z in self.regions[name].get("zips", [])]
+
+
+def build_store(df_scores, root, region, tile_size=64, zips=None, tol=1e-3):
+    """Adds `df_scores` (lat, lon, std_score) to the store at `root` as `region`.
+
+    The first region fixes the lattice; later regions must sit on it.
+    Overlapping regions overwrite shared cells.
+    """
+    lat = df_scores["lat"].to_numpy(dtype=np.float64)
+    lon = df_scores["lon"].to_numpy(dtype=np.float64)
+    values = df_scores["std_score"].to_numpy(dtype=np.float32)
+
+    manifest_path = os.path.join(root, MANIFEST)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        tile_size = manifest["tile_size"]
+    else:
+        manifest = {
+            "lattice": {"lat0": float(lat.min()), "lon0": float(lon.min()),
+                        "lat_step": _min_step(lat), "lon_step": _min_step(lon)},
+            "tile_size": tile_size, "tiles": [], "regions": {}, "score_range": [None, None],
+        }
+    lattice = manifest["lattice"]
+
+    fi = (lat - lattice["lat0"]) / lattice["lat_step"]
+    fj = (lon - lattice["lon0"]) / lattice["lon_step"]
+    if np.abs(fi - np.rint(fi)).max() > tol or np.abs(fj - np.rint(fj)).max() > tol:
+        raise ValueError(f"Scores for {region!r} are not on the store's lat/lon lattice")
+    I = np.rint(fi).astype(np.int64)
+    J = np.rint(fj).astype(np.int64)
+
+    os.makedirs(os.path.join(root, "tiles"), exist_ok=True)
+    tiles = set(manifest["tiles"])
+    T = tile_size
+    frame = pd.DataFrame({"ti": I // T, "tj": J // T, "i": I % T, "j": J % T, "v": values})
+    for (ti, tj), cells in frame.groupby(["ti", "tj"]):
+        key = f"{ti}_{tj}"
+        path = os.path.join(root, "tiles", f"tile_{key}.npy")
+        tile = np.load(path) if key in tiles else np.full((T, T), np.nan, dtype=np.float32)
+        tile[cells["i"].to_numpy(), cells["j"].to_numpy()] = cells["v"].to_numpy()
+        np.save(path, tile)
+        tiles.add(key)
+
+    lo, hi = manifest["score_range"]
+    manifest["score_range"] = [
+        float(np.nanmin(values)) if lo is None else min(lo, float(np.nanmin(values))),
+        float(np.nanmax(values)) if hi is None else max(hi, float(np.nanmax(values))),
+    ]
+    manifest["tiles"] = sorted(tiles)
+    manifest["regions"][region] = {
+        "bbox": [float(lon.min()), float(lat.min()), float(lon.max()), float(lat.max())],
+        "cells": int(len(values)),
+        "zips": list(zips or []),
+    }
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, manifest_path)
+    return ScoreStore(root)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add a region's std_score table to the score store.")
+    parser.add_argument("scores", help="CSV with lat, lon, std_score")
+    parser.add_argument("root", help="score store directory")
+    parser.add_argument("--region", required=True)
+    parser.add_argument("--zips", nargs="*", default=[], help="ZIP codes to fetch listings for")
+    parser.add_argument("--tile-size", type=int, default=64)
+    args = parser.parse_args(argv)
+
+    store = build_store(pd.read_csv(args.scores), args.root, args.region, args.tile_size, args.zips)
+    print(f"{args.root}: {len(store.tiles)} tiles, regions {sorted(store.regions)}")
+
+
+if __name__ == "__main__":
+    main()
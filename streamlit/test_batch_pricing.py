@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from batch_pricing import TableWriter, iter_table, price_stream
+
+
+def portfolio(n=300):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "lat": rng.uniform(33.0, 33.9, n),
+        "lon": rng.uniform(-112.5, -111.6, n),
+        "price": rng.uniform(2e5, 9e5, n).round(),
+        "address": [f"{i} Main St" for i in range(n)],
+        # Empty throughout the first chunk, text afterwards
+        "notes": [None] * 150 + ["pool"] * (n - 150),
+    })
+    return df
+
+
+@pytest.mark.parametrize("suffix", ["parquet", "csv"])
+def test_multi_chunk_csv_with_empty_first_chunk(tmp_path, pipeline, suffix):
+    src = tmp_path / "portfolio.csv"
+    portfolio().to_csv(src, index=False)
+    out = tmp_path / f"priced.{suffix}"
+
+    with TableWriter(str(out)) as writer:
+        rows = price_stream(pipeline, iter_table(str(src), chunk_rows=100), writer)
+
+    expected = pipeline.run(portfolio(), "lat", "lon", "price")
+    priced = pq.read_table(out).to_pandas() if suffix == "parquet" else pd.read_csv(out)
+    assert rows == len(expected) == len(priced)
+    assert priced["notes"].iloc[-1] == "pool"
+    np.testing.assert_allclose(priced["risk_adjusted_price"], expected["risk_adjusted_price"])
+
+
+def test_failed_write_removes_partial_file(tmp_path):
+    out = tmp_path / "out.parquet"
+    with pytest.raises(ValueError):
+        with TableWriter(str(out)) as writer:
+            writer.write(pd.DataFrame({"a": [1.0, 2.0]}))
+            writer.write(pd.DataFrame({"a": ["not a number"]}))
+    assert not out.exists()
+
+
+def test_empty_parquet_writes_no_rows(tmp_path, pipeline):
+    src = tmp_path / "empty.parquet"
+    portfolio().iloc[:0].to_parquet(src, index=False)
+    out = tmp_path / "priced.parquet"
+    with TableWriter(str(out)) as writer:
+        rows = price_stream(pipeline, iter_table(str(src)), writer)
+    assert rows == 0
+    assert not out.exists()
@@ -0,0 +1,62 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+
+from listing_cache import ListingCache, refresh_listings  # noqa: E402
+from mock_realtor import MockRealtorServer  # noqa: E402
+from realtor import RealtorClient  # noqa: E402
+
+ZIPS = ["85003", "85004"]
+
+
+@pytest.fixture
+def mock():
+    with MockRealtorServer(listings_per_zip=250, latency=0) as mock:
+        yield mock
+
+
+def test_incremental_refresh_adds_new_listings_first(tmp_path, mock):
+    # ttl=0: every refresh after the first is incremental
+    cache = ListingCache(str(tmp_path / "listings.sqlite"), ttl=0, full_refresh_ttl=3600)
+    with RealtorClient("test-key", url=mock.url, page_size=100) as client:
+        assert refresh_listings(client, cache, ZIPS) == set()
+        before = cache.load(ZIPS)
+
+        mock.add_listings("85004", 5)
+        sent = client.requests_sent
+        assert refresh_listings(client, cache, ZIPS) == set()
+        incremental_requests = client.requests_sent - sent
+
+    after = cache.load(ZIPS)
+    assert len(before) == 500
+    assert len(after) == 505
+    assert not after["property_id"].duplicated().any()
+    # One page per ZIP: paging stops at the first listing already cached
+    assert incremental_requests == len(ZIPS)
+
+    ids = after.loc[after["zipcode"].astype(str) == "85004", "property_id"].tolist()
+    assert ids[:5] == [f"85004-{k}" for k in range(254, 249, -1)]
+    old_ids = before.loc[before["zipcode"].astype(str) == "85004", "property_id"].tolist()
+    assert ids[5:] == old_ids
+
+
+def test_refresh_without_new_listings_changes_nothing(tmp_path, mock):
+    cache = ListingCache(str(tmp_path / "listings.sqlite"), ttl=0, full_refresh_ttl=3600)
+    with RealtorClient("test-key", url=mock.url, page_size=100) as client:
+        refresh_listings(client, cache, ZIPS)
+        before = cache.load(ZIPS)
+        refresh_listings(client, cache, ZIPS)
+    after = cache.load(ZIPS)
+    assert after["property_id"].tolist() == before["property_id"].tolist()
+
+
+def test_fresh_zips_are_not_fetched(tmp_path, mock):
+    cache = ListingCache(str(tmp_path / "listings.sqlite"), ttl=3600, full_refresh_ttl=3600)
+    with RealtorClient("test-key", url=mock.url, page_size=100) as client:
+        refresh_listings(client, cache, ZIPS)
+        sent = client.requests_sent
+        refresh_listings(client, cache, ZIPS)
+        assert client.requests_sent == sent
@@ -0,0 +1,61 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from price_server import make_handler, price_records
+
+
+@pytest.fixture(scope="module")
+def server(pipeline):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(pipeline))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def post(url, body):
+    request = urllib.request.Request(url + "/price", data=body, method="POST")
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_rows_stay_aligned_with_records(pipeline):
+    records = [
+        {"lat": 33.45, "lon": -112.07, "price": 450000, "id": "a"},
+        {"lon": -112.07, "price": 300000, "id": "b"},
+        {"lat": None, "lon": -112.07, "price": 300000, "id": "c"},
+        {"lat": 33.3, "lon": -112.2, "price": "n/a", "id": "d"},
+        {"lat": "x", "lon": -112.0, "price": 300000, "id": "e"},
+        {"lat": 33.5, "lon": -112.0, "price": 250000, "id": "f"},
+    ]
+    rows = price_records(pipeline, records)
+    assert [r["id"] for r in rows] == list("abcdef")
+    assert [r["error"] is None for r in rows] == [True, False, False, False, False, True]
+    assert rows[0]["risk_adjusted_price"] is not None and rows[5]["risk_adjusted_price"] is not None
+    assert all(r["risk_adjusted_price"] is None for r in rows[1:5])
+    assert rows[1]["error"] == "missing or non-numeric lat/lon"
+    assert rows[3]["error"] == "missing or non-numeric price"
+
+
+@pytest.mark.parametrize("body", [b"[1, 2]", b'{"lat": 1}', b"not json", b'["a"]'])
+def test_malformed_body_is_a_400(server, body):
+    status, payload = post(server, body)
+    assert status == 400 and "error" in payload
+
+
+def test_price_endpoint(server):
+    status, rows = post(server, json.dumps([{"lat": 33.45, "lon": -112.07, "price": 450000}]).encode())
+    assert status == 200 and len(rows) == 1 and rows[0]["error"] is None
+
+
+@pytest.mark.parametrize("path", ["/health", "/health?probe=1", "/metrics?format=text"])
+def test_get_routes_ignore_query_string(server, path):
+    with urllib.request.urlopen(server + path) as response:
+        assert response.status == 200
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pricing import ALPHA, BETA, THRESHOLD, capi_factor, capi_price, minmax_scale, price_listings
+
+
+def test_capi_premium_at_or_below_threshold():
+    crs = np.array([0.0, 0.1, THRESHOLD])
+    np.testing.assert_allclose(capi_factor(crs), 1 - ALPHA * (crs - THRESHOLD))
+    assert capi_factor(0.0) > 1
+
+
+def test_capi_quadratic_penalty_above_threshold():
+    crs = np.array([0.3, 0.6, 1.0])
+    np.testing.assert_allclose(capi_factor(crs), 1 - BETA * (crs - THRESHOLD) ** 2)
+    np.testing.assert_allclose(capi_price([100.0, 200.0, 300.0], crs),
+                               [100.0, 200.0, 300.0] * (1 - BETA * (crs - THRESHOLD) ** 2))
+
+
+def test_capi_continuous_at_threshold():
+    eps = 1e-9
+    assert capi_factor(THRESHOLD) == 1
+    assert capi_factor(THRESHOLD - eps) == pytest.approx(1, abs=1e-8)
+    assert capi_factor(THRESHOLD + eps) == pytest.approx(1, abs=1e-8)
+
+
+def test_nan_scores_pass_through():
+    scaled = minmax_scale([0.2, np.nan, 0.6])
+    np.testing.assert_allclose(scaled, [0.0, np.nan, 1.0])
+    assert np.isnan(capi_factor(np.nan))
+
+    df = pd.DataFrame({"base_price": [100.0, 200.0, np.nan, 400.0],
+                       "std_score": [0.2, np.nan, 0.4, 0.6]})
+    for model in ("linear", "capi"):
+        priced = price_listings(df.copy(), model=model)
+        assert priced["risk_adjusted_price"].isna().tolist() == [False, True, True, False]
+        assert priced["adjustment_pct"].isna().tolist() == [False, True, True, False]
+
+    linear = price_listings(df.copy(), weight=0.5)
+    np.testing.assert_allclose(linear["risk_adjusted_price"].iloc[[0, 3]], [100.0, 200.0])
+    np.testing.assert_allclose(linear["adjustment_pct"].iloc[[0, 3]], [0.0, -50.0])
+
+
+def test_unknown_model():
+    with pytest.raises(ValueError):
+        price_listings(pd.DataFrame({"base_price": [1.0], "std_score": [0.1]}), model="flat")
@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+
+from listing_cache import ListingCache, refresh_listings  # noqa: E402
+from mock_realtor import MockRealtorServer  # noqa: E402
+from refresher import ListingRefresher, make_client  # noqa: E402
+
+ZIPS = ["85003", "85004", "85006"]
+
+
+@pytest.fixture
+def mock():
+    with MockRealtorServer(listings_per_zip=50, latency=0) as mock:
+        yield mock
+
+
+def test_more_queried_zip_is_refreshed_first(tmp_path, mock):
+    cache = ListingCache(str(tmp_path / "listings.sqlite"), ttl=0.01, full_refresh_ttl=3600)
+    with make_client("test-key", mock.url, rate=1000, burst=10) as client:
+        refresh_listings(client, cache, ZIPS)
+        time.sleep(0.05)
+        for _ in range(3):
+            cache.record_queries(["85006"])
+        cache.record_queries(["85004"])
+
+        refresher = ListingRefresher(client, cache, ZIPS, batch_size=1, monthly_quota=None)
+        assert [z for z, _ in refresher.priorities()] == ["85006", "85004", "85003"]
+        del mock.requests[:]
+        assert refresher.run_once() == ["85006"]
+    assert {z for _, z, _ in mock.requests} == {"85006"}
+
+
+def test_quota_stops_mid_batch(tmp_path, mock):
+    # 50 listings in pages of 10: a full refresh of one ZIP takes 5 requests
+    cache = ListingCache(str(tmp_path / "listings.sqlite"))
+    with make_client("test-key", mock.url, rate=1000, burst=10, page_size=10) as client:
+        refresher = ListingRefresher(client, cache, ZIPS, batch_size=len(ZIPS), monthly_quota=7)
+        assert refresher.run_once() == ZIPS
+        assert refresher.quota_left() == 0
+        assert refresher.run_once() == []
+
+    assert len(mock.requests) == 7
+    assert cache.requests_this_month() == 7
+    # ZIPs cut off by the quota keep no partial refresh
+    assert len(cache.load(ZIPS)) == 50 * len(cache.state(ZIPS))
+
+
+def test_throttled_requests_are_retried(tmp_path):
+    with MockRealtorServer(listings_per_zip=50, latency=0, throttle_rate=0.3) as mock:
+        cache = ListingCache(str(tmp_path / "listings.sqlite"))
+        with make_client("test-key", mock.url, rate=1000, burst=10, page_size=10,
+                         retries=8, backoff=0.001) as client:
+            refresher = ListingRefresher(client, cache, ZIPS, batch_size=len(ZIPS), monthly_quota=None)
+            assert refresher.run_once() == ZIPS
+
+    assert len(cache.load(ZIPS)) == 50 * len(ZIPS)
+    assert len(cache.state(ZIPS)) == len(ZIPS)
+    # 15 pages, plus one request per 429; retries count against the quota too
+    assert len(mock.requests) > 15
+    assert cache.requests_this_month() == len(mock.requests)
+
+
+def test_zip_throttled_past_its_retries_sits_out(tmp_path):
+    with MockRealtorServer(listings_per_zip=50, latency=0, throttle_rate=1.0) as mock:
+        cache = ListingCache(str(tmp_path / "listings.sqlite"))
+        with make_client("test-key", mock.url, rate=1000, burst=10, retries=2, backoff=0.001) as client:
+            refresher = ListingRefresher(client, cache, ZIPS, batch_size=len(ZIPS), monthly_quota=None)
+            assert refresher.run_once() == ZIPS
+            assert refresher.priorities() == []
+
+    assert len(mock.requests) == 3 * len(ZIPS)
+    assert cache.load(ZIPS).empty
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.interpolate import RegularGridInterpolator
+
+from risk_grid import GridIndex, KDTreeIndex, build_index
+
+LATS = 33.9 - np.arange(12) / 24
+LONS = -112.3 + np.arange(9) / 24
+
+
+@pytest.fixture
+def scores():
+    lat, lon = np.meshgrid(LATS, LONS, indexing="ij")
+    rng = np.random.default_rng(0)
+    # Shuffled rows, as a score CSV need not be in grid order
+    df = pd.DataFrame({"lat": lat.ravel(), "lon": lon.ravel(), "std_score": rng.random(lat.size)})
+    return df.sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+def points(n=2000, margin=0.1, seed=1):
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(LATS.min() - margin, LATS.max() + margin, n)
+    lon = rng.uniform(LONS.min() - margin, LONS.max() + margin, n)
+    return lat, lon
+
+
+def brute_force_nearest(df, lat, lon):
+    d2 = (lat[:, None] - df["lat"].to_numpy()) ** 2 + (lon[:, None] - df["lon"].to_numpy()) ** 2
+    return d2.argmin(axis=1)
+
+
+def test_regular_lattice_builds_a_grid(scores):
+    assert isinstance(build_index(scores), GridIndex)
+    assert isinstance(build_index(scores.iloc[1:]), KDTreeIndex)
+
+
+def test_grid_nearest_matches_brute_force(scores):
+    index = build_index(scores)
+    lat, lon = points()
+    expected = brute_force_nearest(scores, lat, lon)
+    np.testing.assert_array_equal(index.nearest(lat, lon), expected)
+    np.testing.assert_array_equal(index.lookup(lat, lon), scores["std_score"].to_numpy()[expected])
+
+
+def test_kdtree_nearest_matches_brute_force(scores):
+    irregular = scores.iloc[3:].copy()
+    irregular["lat"] += np.random.default_rng(2).normal(0, 0.005, len(irregular))
+    index = build_index(irregular)
+    lat, lon = points()
+    expected = brute_force_nearest(irregular, lat, lon)
+    np.testing.assert_array_equal(index.nearest(lat, lon), expected)
+    np.testing.assert_array_equal(index.lookup(lat, lon), irregular["std_score"].to_numpy()[expected])
+
+
+def test_bilinear_matches_regular_grid_interpolation(scores):
+    index = build_index(scores)
+    grid = scores.pivot(index="lat", columns="lon", values="std_score")
+    interpolate = RegularGridInterpolator((grid.index.to_numpy(), grid.columns.to_numpy()), grid.to_numpy())
+    lat, lon = points()
+    # Outside the lattice the lookup holds the edge value, so clamp before interpolating
+    clamped = np.column_stack([np.clip(lat, LATS.min(), LATS.max()), np.clip(lon, LONS.min(), LONS.max())])
+    np.testing.assert_allclose(index.lookup(lat, lon, method="bilinear"), interpolate(clamped), atol=1e-12)
+    # At cell centres bilinear and nearest agree
+    np.testing.assert_allclose(index.lookup(scores["lat"], scores["lon"], method="bilinear"),
+                               scores["std_score"], atol=1e-12)